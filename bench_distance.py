@@ -0,0 +1,94 @@
+"""距離計算ベンチマーク
+
+従来の geopy.geodesic ループと geo_distance の一括計算を比較する。
+geopy はこのベンチマークでしか使わないので requirements.txt には含めていない。
+
+    pip install geopy
+    python bench_distance.py
+    python bench_distance.py --sizes 10 1000 100000 --json bench_distance.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from walknav.geo_distance import METHODS, distance_to_many
+
+# 川崎駅を基準点とし、首都圏の範囲にランダムな点を配置する
+ORIGIN = (35.5308, 139.7029)
+LAT_RANGE = (35.3, 35.9)
+LON_RANGE = (139.3, 140.0)
+
+
+def _best_of(func, repeat):
+    """repeat回実行した最短時間（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(sizes, repeat=3, seed=0):
+    """各点数について geodesic ループと各計算方式の所要時間を計測"""
+    rng = np.random.default_rng(seed)
+    results = []
+
+    for n in sizes:
+        lats = rng.uniform(*LAT_RANGE, n)
+        lons = rng.uniform(*LON_RANGE, n)
+        points = list(zip(lats.tolist(), lons.tolist()))
+
+        # geodesicループは大きな点数では遅いので1回だけ計測
+        loop_time = _best_of(
+            lambda: [geodesic(ORIGIN, p).kilometers for p in points],
+            repeat if n <= 1000 else 1
+        )
+        row = {'points': n, 'geodesic_loop_s': loop_time}
+
+        for method in METHODS:
+            elapsed = _best_of(
+                lambda: distance_to_many(ORIGIN[0], ORIGIN[1], lats, lons, method),
+                repeat
+            )
+            row[f'{method}_s'] = elapsed
+            row[f'{method}_speedup'] = loop_time / elapsed if elapsed > 0 else float('inf')
+
+        results.append(row)
+
+    return results
+
+
+def print_table(results):
+    """結果を表形式で表示"""
+    header = f"{'points':>8} {'geodesic loop':>14}" + ''.join(f" {m:>20}" for m in METHODS)
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        line = f"{row['points']:>8} {row['geodesic_loop_s'] * 1000:>11.2f} ms"
+        for method in METHODS:
+            line += f" {row[f'{method}_s'] * 1000:>9.2f} ms ({row[f'{method}_speedup']:>5.0f}x)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='距離計算ベンチマーク')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='結果をJSONで書き出すパス')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, repeat=args.repeat, seed=args.seed)
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""ルート生成ベンチマーク
+
+Streamlit UI を起動せずに walknav コアの読み込み・ルート生成・位置情報の付加・
+距離計算の所要時間をパラメータの組み合わせごとに計測し、結果をJSONで書き出す。
+コアの読み込み時間が IMPORT_BUDGET_MS を超えた場合も終了コード1で終わる。
+
+    python bench_routes.py --output bench_routes.json
+    python bench_routes.py --baseline bench_routes.json --threshold 0.2
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from walknav import location, polyline, resources, routes, street_graph
+from walknav.geo_distance import METHODS, path_length_km
+
+WALKING_TIMES = [15, 30, 45, 60, 75, 90, 105, 120]
+MOBILITIES = ['slow', 'normal', 'fast']
+
+# ベンチマークの基準地点（川崎駅周辺）
+ORIGIN = (35.5308, 139.7029)
+
+
+# コアの読み込み時間の上限（ms、インタプリタの起動は含まない）
+IMPORT_BUDGET_MS = 300
+IMPORT_MODULES = ['walknav', 'walknav.location', 'walknav.routes', 'walknav.tracking']
+
+
+def area_types():
+    """ルート生成で区別される地域種別の一覧"""
+    types = [info['area_type'] for _, info in resources.CITY_ZONES]
+    types.append(location.analyze_coordinates(0.0, 0.0)['area_type'])  # 該当地域なしの既定値
+    return list(dict.fromkeys(types))
+
+
+def measure(func, repeat, seed):
+    """乱数を固定して repeat 回実行し、所要時間（ms）の統計を返す"""
+    timings = []
+    for i in range(repeat):
+        random.seed(seed + i)
+        np.random.seed(seed + i)
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings)
+
+
+def summarize(timings):
+    """所要時間（ms）のリストの統計"""
+    timings = sorted(timings)
+    repeat = len(timings)
+    return {
+        'repeat': repeat,
+        'min_ms': timings[0],
+        'median_ms': statistics.median(timings),
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'max_ms': timings[-1]
+    }
+
+
+def bench_route_generation(repeat, seed):
+    """歩行時間・歩行ペース・地域種別の全組み合わせでルート生成を計測"""
+    base_location = location.get_detailed_location_info(*ORIGIN)
+    results = []
+
+    for walking_time, mobility, area_type in itertools.product(WALKING_TIMES, MOBILITIES, area_types()):
+        area_location = dict(base_location, area_type=area_type)
+        preferences = {
+            'mobility': mobility,
+            'walking_time': walking_time,
+            'interests': ['自然・公園', '歴史・文化'],
+            'safety_level': 'high'
+        }
+        stats = measure(lambda: routes.generate_detailed_routes_from_gps(area_location, preferences), repeat, seed)
+        results.append({
+            'benchmark': 'generate_detailed_routes_from_gps',
+            'params': {'walking_time': walking_time, 'mobility': mobility, 'area_type': area_type},
+            **stats
+        })
+
+    # ルート形状ごとの座標生成と詳細情報の作成
+    for name, generator in (('generate_grid_route', routes.generate_grid_route),
+                            ('generate_radial_route', routes.generate_radial_route),
+                            ('generate_circular_route', routes.generate_circular_route)):
+        for distance_km in (1.0, 4.0, 8.0):
+            stats = measure(lambda: generator(ORIGIN[0], ORIGIN[1], distance_km), repeat, seed)
+            results.append({'benchmark': name, 'params': {'distance_km': distance_km}, **stats})
+
+    coords = routes.generate_circular_route(ORIGIN[0], ORIGIN[1], 4.0)
+    stats = measure(lambda: routes.create_detailed_route_info(
+        '健康コース', coords, 4.0, 60, ['グルメ'], base_location, 88
+    ), repeat, seed)
+    results.append({'benchmark': 'create_detailed_route_info', 'params': {'distance_km': 4.0}, **stats})
+
+    route = routes.create_detailed_route_info('健康コース', coords, 4.0, 60, ['グルメ'], base_location, 88)
+    stats = measure(lambda: routes.build_route_details(route), repeat, seed)
+    results.append({'benchmark': 'build_route_details', 'params': {'distance_km': 4.0}, **stats})
+
+    return results
+
+
+def bench_location_enrichment(repeat, seed):
+    """位置情報の付加（キャッシュなし・キャッシュあり）を計測"""
+    rng = np.random.default_rng(seed)
+    points = list(zip(rng.uniform(35.50, 35.70, 200).tolist(), rng.uniform(139.60, 139.78, 200).tolist()))
+
+    def enrich_uncached():
+        for lat, lon in points:
+            location.get_area_details(lat, lon)
+
+    def enrich_cached():
+        for lat, lon in points:
+            location.get_detailed_location_info(lat, lon)
+
+    resources.get_location_cache().clear()
+    enrich_cached()  # キャッシュを温める
+
+    return [
+        {'benchmark': 'get_area_details', 'params': {'points': len(points)},
+         **measure(enrich_uncached, repeat, seed)},
+        {'benchmark': 'get_detailed_location_info', 'params': {'points': len(points), 'cache': 'warm'},
+         **measure(enrich_cached, repeat, seed)},
+    ]
+
+
+def bench_distances(repeat, seed):
+    """生成ルートの距離計算と最寄り駅検索を計測"""
+    random.seed(seed)
+    coords = routes.generate_circular_route(ORIGIN[0], ORIGIN[1], 8.0)
+    results = []
+    for method in METHODS:
+        results.append({
+            'benchmark': 'path_length_km',
+            'params': {'method': method, 'points': len(coords)},
+            **measure(lambda: path_length_km(coords, method), repeat, seed)
+        })
+
+    results.append({
+        'benchmark': 'find_nearest_station',
+        'params': {'points': len(coords)},
+        **measure(lambda: [location.find_nearest_station(lat, lon) for lat, lon in coords], repeat, seed)
+    })
+    return results
+
+
+def bench_street_routing(repeat, seed):
+    """道路グラフ上の周回ルート探索（A*・縮約階層）を計測（データがなければ省略）"""
+    graph = resources.get_street_graph()
+    if graph is None:
+        return []
+
+    routers = [('astar', None)]
+    hierarchy = resources.get_street_hierarchy()
+    if hierarchy is not None:
+        routers.append(('contraction', hierarchy))
+
+    results = []
+    for (name, router), distance_km in itertools.product(routers, (2.0, 5.0, 8.0)):
+        stats = measure(lambda: street_graph.plan_loop_route(graph, ORIGIN[0], ORIGIN[1], distance_km, router=router),
+                        repeat, seed)
+        results.append({'benchmark': 'plan_loop_route',
+                        'params': {'router': name, 'distance_km': distance_km}, **stats})
+    return results
+
+
+def bench_facilities(repeat, seed):
+    """ルート沿いの施設検索を計測（施設データがなければ省略）"""
+    facility_index = resources.get_facility_index()
+    if facility_index is None:
+        return []
+
+    results = []
+    for distance_km in (2.0, 5.0, 10.0):
+        random.seed(seed)
+        coords = routes.generate_circular_route(ORIGIN[0], ORIGIN[1], distance_km)
+        stats = measure(lambda: facility_index.along_route(coords, buffer_m=routes.FACILITY_BUFFER_M), repeat, seed)
+        results.append({'benchmark': 'facilities_along_route',
+                        'params': {'distance_km': distance_km, 'facilities': len(facility_index)}, **stats})
+    return results
+
+
+def bench_polyline(repeat, seed):
+    """散歩経路（1秒間隔）の地図表示用の簡略化と符号化を計測"""
+    results = []
+    for minutes in (30, 120):
+        rng = np.random.default_rng(seed)
+        size = minutes * 60
+        lats = ORIGIN[0] + np.cumsum(rng.normal(0, 1e-5, size))
+        lons = ORIGIN[1] + np.cumsum(rng.normal(0, 1e-5, size))
+        for zoom in (14, 16, 18):
+            coords = polyline.simplify_for_zoom(lats, lons, zoom, max_vertices=1000)
+            params = {'points': size, 'zoom': zoom, 'vertices': len(coords)}
+            stats = measure(lambda: polyline.simplify_for_zoom(lats, lons, zoom, max_vertices=1000), repeat, seed)
+            results.append({'benchmark': 'polyline_simplify', 'params': params, **stats})
+            # 符号化するのはそのズームで簡略化した座標
+            results.append({'benchmark': 'polyline_encode', 'params': params,
+                            **measure(lambda: polyline.encode(coords), repeat, seed)})
+    return results
+
+
+def cold_import_ms(module):
+    """新しいインタプリタで module を読み込むのにかかった時間（ms）"""
+    code = f'import time; start = time.perf_counter(); import {module}; print((time.perf_counter() - start) * 1000)'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(result.stdout)
+
+
+def bench_import(repeat):
+    """コアの各モジュールの初回読み込み時間を計測（毎回別のプロセスで読み込む）"""
+    return [{'benchmark': 'cold_import', 'params': {'module': module},
+             **summarize([cold_import_ms(module) for _ in range(repeat)])}
+            for module in IMPORT_MODULES]
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """基準結果より中央値が threshold（割合）以上遅くなったケースを列挙"""
+    def case_key(row):
+        return row['benchmark'], json.dumps(row['params'], sort_keys=True, ensure_ascii=False)
+
+    baseline_rows = {case_key(row): row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        base = baseline_rows.get(case_key(row))
+        if base and base['median_ms'] > 0:
+            ratio = row['median_ms'] / base['median_ms']
+            if ratio > 1 + threshold:
+                regressions.append({**row, 'baseline_median_ms': base['median_ms'], 'ratio': ratio})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ルート生成ベンチマーク')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='結果をJSONで書き出すパス')
+    parser.add_argument('--baseline', help='比較対象の結果JSON')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='中央値がこの割合以上遅くなったら退行とみなす')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_MS,
+                        help='コアの読み込み時間の中央値の上限（ms）')
+    args = parser.parse_args()
+
+    results = bench_import(min(args.repeat, 10))
+    results += bench_route_generation(args.repeat, args.seed)
+    results += bench_location_enrichment(args.repeat, args.seed)
+    results += bench_distances(args.repeat, args.seed)
+    results += bench_street_routing(args.repeat, args.seed)
+    results += bench_facilities(args.repeat, args.seed)
+    results += bench_polyline(args.repeat, args.seed)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'results': results
+    }
+
+    for row in results:
+        params = ', '.join(f'{k}={v}' for k, v in row['params'].items())
+        print(f"{row['benchmark']:<36} {params:<60} median {row['median_ms']:8.3f} ms  p95 {row['p95_ms']:8.3f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failed = False
+    for row in results:
+        if row['benchmark'] == 'cold_import' and row['median_ms'] > args.import_budget:
+            print(f"読み込み時間の上限超過: {row['params']['module']} "
+                  f"{row['median_ms']:.1f} ms > {args.import_budget:.0f} ms")
+            failed = True
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        for row in regressions:
+            print(f"退行: {row['benchmark']} {row['params']} "
+                  f"{row['baseline_median_ms']:.3f} ms -> {row['median_ms']:.3f} ms ({row['ratio']:.2f}x)")
+        failed = failed or bool(regressions)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""安心散歩ナビのコア（位置情報・ルート生成・散歩の追跡）
+
+Streamlit に依存せず、ワーカーやベンチマークから直接使える。サブモジュールと
+主な関数は最初に参照されたときに読み込むので、``import walknav`` 自体は
+numpy なども読み込まない。
+
+    import walknav
+    location = walknav.get_detailed_location_info(35.5308, 139.7029)
+    routes = walknav.generate_detailed_routes_from_gps(location, {'walking_time': 30})
+"""
+import importlib
+
+# 公開する名前 -> 定義しているサブモジュール
+_EXPORTS = {
+    'acquire_gps_location': 'location',
+    'analyze_coordinates': 'location',
+    'find_nearest_landmark': 'location',
+    'find_nearest_station': 'location',
+    'get_area_details': 'location',
+    'get_detailed_location_info': 'location',
+    'get_precise_gps_location': 'location',
+    'build_route_details': 'routes',
+    'create_detailed_route_info': 'routes',
+    'generate_area_aware_route': 'routes',
+    'generate_detailed_routes_from_gps': 'routes',
+    'get_cached_routes': 'routes',
+    'finish_walking_session': 'tracking',
+    'get_gps_fix_batch': 'tracking',
+    'get_walking_stats': 'tracking',
+    'start_walking_session': 'tracking',
+    'update_walking_progress': 'tracking',
+}
+
+_SUBMODULES = {
+    'contraction', 'edge_costs', 'elevation', 'facilities', 'footprint', 'geo_distance', 'geohash',
+    'gps_pipeline', 'history_store', 'location', 'location_sources', 'lru_cache', 'polyline',
+    'profiling', 'regions', 'resources', 'route_cache', 'routes', 'score_raster', 'simulation',
+    'spatial_index', 'street_graph', 'track_buffer', 'tracking',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f'.{name}', __name__)
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    # 2回目以降は通常の属性として参照させる
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
@@ -0,0 +1,306 @@
+"""歩行者道路グラフの縮約階層（Contraction Hierarchies）
+
+オフラインで street_graph.py のグラフからノードを重要度の低い順に縮約して
+ショートカット辺を加え、上向き（順位の高いノードへ向かう）辺だけをCSR配列で
+保存する。保存したディレクトリはメモリマップで読み込み、探索では訪れたノードの
+上向き辺だけを Python のリストに読み出して覚えておく（全体は展開しない）。
+
+    python -m walknav.contraction data/street_graph.npz data/street_graph_ch --scores data/scores.raster
+"""
+import argparse
+import heapq
+import math
+import os
+
+import numpy as np
+
+from .edge_costs import EdgeCostTable, preset_name, presets
+from .score_raster import ScoreRaster
+from .street_graph import StreetGraph
+
+_ARRAYS = ('rank', 'up_indptr', 'up_indices', 'up_weights', 'up_middle')
+
+# 上向き辺をリストで覚えておくノード数の上限（超えたら覚え直す）
+MAX_CACHED_NODES = int(os.environ.get('WALK_HIERARCHY_CACHED_NODES', 100_000))
+
+
+def _witness_distances(adj, source, skip, limit, max_settled):
+    """skip を通らずに source から limit 以内で行けるノードまでの距離（探索数に上限あり）"""
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+
+    while heap and settled < max_settled:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        settled += 1
+        for neighbor, (weight, _) in adj[node].items():
+            if neighbor == skip:
+                continue
+            nd = d + weight
+            if nd <= limit and nd < dist.get(neighbor, math.inf):
+                dist[neighbor] = nd
+                heapq.heappush(heap, (nd, neighbor))
+    return dist
+
+
+def _shortcuts_needed(adj, node, max_settled):
+    """node を縮約する場合に必要なショートカット (u, w, 重み) の一覧"""
+    neighbors = list(adj[node].items())
+    max_weight = max((weight for _, (weight, _) in neighbors), default=0.0)
+    shortcuts = []
+    for i, (u, (weight_u, _)) in enumerate(neighbors[:-1]):
+        # u から残りの近傍すべてへの迂回路を1回の探索でまとめて調べる
+        witness = _witness_distances(adj, u, node, weight_u + max_weight, max_settled)
+        for w, (weight_w, _) in neighbors[i + 1:]:
+            via = weight_u + weight_w
+            if witness.get(w, math.inf) > via:
+                shortcuts.append((u, w, via))
+    return shortcuts
+
+
+def build_contraction_hierarchy(graph, weights=None, max_settled=50):
+    """グラフの縮約階層を構築（weights 省略時は辺の長さで最短経路を求める）"""
+    weights = graph.lengths if weights is None else np.asarray(weights, dtype=np.float32)
+    n = graph.node_count
+
+    # 作業用の隣接リスト（近傍ノード -> (重み, 中間ノード)、平行辺は短い方のみ）
+    adj = [dict() for _ in range(n)]
+    indptr = graph.indptr.tolist()
+    indices = graph.indices.tolist()
+    weight_list = weights.tolist()
+    for u in range(n):
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if v != u and weight_list[k] < adj[u].get(v, (math.inf, -1))[0]:
+                adj[u][v] = (weight_list[k], -1)
+
+    contracted_neighbors = [0] * n
+    levels = [0] * n
+
+    def priority(node):
+        # 辺差分（増えるショートカット数 - 消える辺数）・縮約済み近傍数・階層の深さで
+        # 重要度を見積もる（深さを入れると縮約が偏らず、探索範囲が狭くなる）
+        shortcuts = _shortcuts_needed(adj, node, max_settled)
+        edge_difference = len(shortcuts) - len(adj[node])
+        return 2 * edge_difference + contracted_neighbors[node] + levels[node], shortcuts
+
+    heap = [(priority(node)[0], node) for node in range(n)]
+    heapq.heapify(heap)
+
+    rank = np.empty(n, dtype=np.int32)
+    upward = [None] * n
+    order = 0
+
+    while heap:
+        _, node = heapq.heappop(heap)
+        # 重要度は近傍の縮約で変わるので、取り出した時点で見直す（遅延更新）
+        current, shortcuts = priority(node)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, node))
+            continue
+
+        for u, w, via in shortcuts:
+            if via < adj[u].get(w, (math.inf, -1))[0]:
+                adj[u][w] = (via, node)
+                adj[w][u] = (via, node)
+
+        # 残っている近傍はすべて順位が上なので、その辺が上向き辺になる
+        upward[node] = list(adj[node].items())
+        for neighbor in adj[node]:
+            del adj[neighbor][node]
+            contracted_neighbors[neighbor] += 1
+            levels[neighbor] = max(levels[neighbor], levels[node] + 1)
+        adj[node] = {}
+
+        rank[node] = order
+        order += 1
+
+    counts = [len(edges) for edges in upward]
+    up_indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    flat = [edge for edges in upward for edge in edges]
+    return ContractionHierarchy(
+        rank,
+        up_indptr,
+        np.array([v for v, _ in flat], dtype=np.int32),
+        np.array([w for _, (w, _) in flat], dtype=np.float32),
+        np.array([m for _, (_, m) in flat], dtype=np.int32)
+    )
+
+
+class ContractionHierarchy:
+    """縮約階層による最短経路探索
+
+    出発側・到着側の両方から上向き辺だけをたどる双方向ダイクストラ法で、
+    探索するノードは元のグラフのごく一部で済む。見つかった経路のショートカットは
+    中間ノードをたどって元の辺に展開する。
+
+    探索ループは Python で回すので、ノードの上向き辺は初めて訪れたときに配列から
+    リストへ読み出して覚えておく（ノードごとに毎回配列をスライスすると、それだけで
+    探索時間の大半を占める）。配列全体を読み込み時にリストにすると 4〜8 倍の
+    メモリを使い、使わないプリセットやルート生成の各プロセスでも同じだけ消費して
+    メモリマップを共有する意味がなくなる。覚えるのは実際にルートを作った周辺と
+    順位の高いノードだけで、MAX_CACHED_NODES を超えたら捨てて覚え直す。
+    """
+
+    def __init__(self, rank, up_indptr, up_indices, up_weights, up_middle):
+        self.rank = rank
+        self.up_indptr = up_indptr
+        self.up_indices = up_indices
+        self.up_weights = up_weights
+        self.up_middle = up_middle
+        self._edges = {}  # ノード -> (最初の辺の番号, 上向き辺の先のノード, 重み)
+
+    def _up_edges(self, node):
+        """ノードの上向き辺（初めて訪れたときに配列から読み出す）"""
+        edges = self._edges.get(node)
+        if edges is None:
+            if len(self._edges) >= MAX_CACHED_NODES:
+                self._edges.clear()
+            start, end = int(self.up_indptr[node]), int(self.up_indptr[node + 1])
+            edges = (start, self.up_indices[start:end].tolist(), self.up_weights[start:end].tolist())
+            self._edges[node] = edges
+        return edges
+
+    def save(self, directory):
+        """配列を1つずつ .npy で保存（読み込み時にメモリマップできる形式）"""
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), np.asarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """save() で保存した縮約階層を読み込む（既定ではメモリマップ）"""
+        mode = 'r' if mmap else None
+        # 配列は同じマップ領域を指す通常の ndarray として持つ
+        return cls(*(np.asarray(np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mode))
+                     for name in _ARRAYS))
+
+    def shortest_path(self, source, target):
+        """最短経路を求める（ノード番号のリストと距離、到達不能ならNone）"""
+        if source == target:
+            return [source], 0.0
+
+        edges_cache, up_edges = self._edges, self._up_edges
+        heappush, heappop, inf = heapq.heappush, heapq.heappop, math.inf
+
+        # 親は (前のノード, 辺の番号) で持ち、ショートカットの展開時に中間ノードを引く
+        dists = ({source: 0.0}, {target: 0.0})
+        parents = ({source: None}, {target: None})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        best = inf
+        meeting = None
+        side = 0
+
+        while True:
+            # 残りの最小距離が暫定最短以上になった側は探索を打ち切る
+            heap = heaps[side]
+            if not heap or heap[0][0] >= best:
+                side = 1 - side
+                heap = heaps[side]
+                if not heap or heap[0][0] >= best:
+                    break
+            d, node = heappop(heap)
+            dist = dists[side]
+            if d > dist[node]:
+                side = 1 - side
+                continue
+
+            other = dists[1 - side].get(node)
+            if other is not None and d + other < best:
+                best = d + other
+                meeting = node
+
+            edges = edges_cache.get(node) or up_edges(node)
+            start, neighbors, neighbor_weights = edges
+            # 上位ノード経由の方が近ければ、このノードは最短経路上にないので先へ広げない
+            stalled = False
+            for neighbor, weight in zip(neighbors, neighbor_weights):
+                if dist.get(neighbor, inf) + weight < d:
+                    stalled = True
+                    break
+            if not stalled:
+                parent = parents[side]
+                for offset, neighbor in enumerate(neighbors):
+                    nd = d + neighbor_weights[offset]
+                    if nd < dist.get(neighbor, inf):
+                        dist[neighbor] = nd
+                        parent[neighbor] = (node, start + offset)
+                        heappush(heap, (nd, neighbor))
+            side = 1 - side
+
+        if meeting is None:
+            return None
+
+        # 出会ったノードから両端へさかのぼり、ショートカットを展開する
+        middles = self.up_middle
+        forward = []
+        node = meeting
+        while parents[0][node] is not None:
+            prev, k = parents[0][node]
+            forward.append((prev, node, int(middles[k])))
+            node = prev
+        forward.reverse()
+
+        backward = []
+        node = meeting
+        while parents[1][node] is not None:
+            nxt, k = parents[1][node]
+            backward.append((node, nxt, int(middles[k])))
+            node = nxt
+
+        path = [source]
+        for u, v, middle in forward + backward:
+            path.extend(self._unpack(u, v, middle)[1:])
+        return path, best
+
+    def _edge_middle(self, u, v):
+        """u-v 間の辺（最も軽いもの）の中間ノード"""
+        low, high = (u, v) if self.rank[u] < self.rank[v] else (v, u)
+        start, neighbors, neighbor_weights = self._up_edges(low)
+        best_weight, best_k = math.inf, -1
+        for offset, neighbor in enumerate(neighbors):
+            if neighbor == high and neighbor_weights[offset] < best_weight:
+                best_weight, best_k = neighbor_weights[offset], start + offset
+        return int(self.up_middle[best_k]) if best_k >= 0 else -1
+
+    def _unpack(self, u, v, middle):
+        """ショートカット u-v を元の辺のノード列に展開"""
+        path = [u]
+        stack = [(u, v, middle)]
+        while stack:
+            a, b, m = stack.pop()
+            if m < 0:
+                path.append(b)
+            else:
+                # 後半を先に積むことで前半から順に展開される
+                stack.append((m, b, self._edge_middle(m, b)))
+                stack.append((a, m, self._edge_middle(a, m)))
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='道路グラフの縮約階層を作成')
+    parser.add_argument('graph', help='street_graph.py で作成したグラフ（.npz）')
+    parser.add_argument('output', help='出力ディレクトリ')
+    parser.add_argument('--scores', help='安全度・歩きやすさのラスター（指定時はプリセットごとにも作成）')
+    args = parser.parse_args()
+
+    graph = StreetGraph.load(args.graph)
+    hierarchy = build_contraction_hierarchy(graph)
+    hierarchy.save(args.output)
+    print(f'ノード数: {graph.node_count}, 上向き辺数: {len(hierarchy.up_indices)}')
+
+    if args.scores:
+        # プリセットごとの辺コストで構築したものを <出力>/<プリセット名> に保存
+        cost_table = EdgeCostTable(graph, ScoreRaster(args.scores))
+        for safety_level, mobility in presets():
+            name = preset_name(safety_level, mobility)
+            preset_hierarchy = build_contraction_hierarchy(graph, cost_table.costs(safety_level, mobility))
+            preset_hierarchy.save(os.path.join(args.output, name))
+            print(f'{name}: 上向き辺数 {len(preset_hierarchy.up_indices)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""安全度・歩きやすさを考慮した道路の辺コスト
+
+辺の長さに、辺の中点の安全度・歩きやすさ（score_raster.py のラスター）から
+求めた割増しを掛けたものを探索のコストにする。割増しの重みは利用者の
+安全重視度と歩行ペースの組（プリセット）ごとに決めておき、全プリセットの
+コストを読み込み時にまとめて計算しておく。
+"""
+import itertools
+
+import numpy as np
+
+# 安全重視度ごとの、安全度の低さに対する割増しの重み
+SAFETY_WEIGHTS = {'low': 0.0, 'medium': 0.5, 'high': 1.0}
+
+# 歩行ペースごとの、歩きにくさに対する割増しの重み（ゆっくり歩く人ほど歩道を重視）
+WALKABILITY_WEIGHTS = {'slow': 1.0, 'normal': 0.5, 'fast': 0.2}
+
+# ラスターに値がない辺に使う中間的なスコア
+DEFAULT_SAFETY = 80
+DEFAULT_WALKABILITY = 75
+
+
+def preset_name(safety_level, mobility):
+    """プリセット名（縮約階層の保存先などに使う）"""
+    return f'{safety_level}_{mobility}'
+
+
+def presets():
+    """全プリセットの (安全重視度, 歩行ペース) の一覧"""
+    return list(itertools.product(SAFETY_WEIGHTS, WALKABILITY_WEIGHTS))
+
+
+def edge_scores(graph, score_raster):
+    """各辺の中点の安全度・歩きやすさ（辺の並びは graph.indices と同じ）"""
+    sources = np.repeat(np.arange(graph.node_count), np.diff(graph.indptr))
+    targets = graph.indices
+    mid_lats = (graph.node_lats[sources] + graph.node_lats[targets]) / 2
+    mid_lons = (graph.node_lons[sources] + graph.node_lons[targets]) / 2
+
+    scores = score_raster.lookup_many(mid_lats, mid_lons)
+    safety = np.where(np.isnan(scores['safety']), DEFAULT_SAFETY, scores['safety'])
+    walkability = np.where(np.isnan(scores['walkability']), DEFAULT_WALKABILITY, scores['walkability'])
+    return safety, walkability
+
+
+def composite_costs(lengths, safety, walkability, safety_weight, walkability_weight):
+    """辺の長さに安全度・歩きやすさの割増しを掛けたコスト
+
+    割増しは1以上なので、直線距離を使うA*の推定値はそのまま使える。
+    """
+    penalty = (1 + safety_weight * (1 - safety / 100)
+               + walkability_weight * (1 - walkability / 100))
+    return (lengths * penalty).astype(np.float32)
+
+
+class EdgeCostTable:
+    """プリセットごとの辺コストを事前計算して保持する"""
+
+    def __init__(self, graph, score_raster):
+        safety, walkability = edge_scores(graph, score_raster)
+        self._arrays = {
+            preset_name(safety_level, mobility): composite_costs(
+                graph.lengths, safety, walkability,
+                SAFETY_WEIGHTS[safety_level], WALKABILITY_WEIGHTS[mobility]
+            )
+            for safety_level, mobility in presets()
+        }
+        self._lists = {}
+
+    def costs(self, safety_level, mobility):
+        """プリセットの辺コスト配列（縮約階層の構築用）"""
+        return self._arrays[preset_name(safety_level, mobility)]
+
+    def weights(self, safety_level, mobility):
+        """探索ループ用にリストにした辺コスト（プリセットごとに初回だけ変換）"""
+        name = preset_name(safety_level, mobility)
+        if name not in self._lists:
+            self._lists[name] = self._arrays[name].tolist()
+        return self._lists[name]
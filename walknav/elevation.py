@@ -0,0 +1,182 @@
+"""標高グリッド（DEM）の読み込みと補間
+
+緯度経度の等間隔グリッドに float32 の標高を並べたバイナリファイルを
+メモリマップで開き、ルート全体の標高をまとめて双線形補間で求める。
+国土地理院の標高タイル（テキスト形式）からの変換も行える。
+
+    python -m walknav.elevation <タイルのディレクトリ> <ズームレベル> data/elevation.dem
+"""
+import glob
+import math
+import os
+import struct
+import sys
+
+import numpy as np
+
+# ヘッダー: マジック, 版, 行数, 列数, 南西端の緯度・経度, 緯度・経度の間隔, 欠測値
+_MAGIC = b'WDEM'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHII4df')
+HEADER_SIZE = 64
+
+# 国土地理院タイルの1辺の画素数と欠測を表す文字
+GSI_TILE_SIZE = 256
+GSI_NODATA = 'e'
+
+
+def write_grid(path, elevations, south, west, dlat, dlon, nodata=-9999.0):
+    """標高の2次元配列（行は南から北、列は西から東）をグリッドファイルに保存"""
+    elevations = np.asarray(elevations, dtype='<f4')
+    rows, cols = elevations.shape
+    header = _HEADER.pack(_MAGIC, _VERSION, rows, cols, south, west, dlat, dlon, nodata)
+    with open(path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.write(np.where(np.isnan(elevations), nodata, elevations).astype('<f4').tobytes())
+
+
+class ElevationGrid:
+    """メモリマップした標高グリッド
+
+    ファイル全体を読み込まずに開けるので、広い範囲のデータでも起動は速く、
+    参照した部分だけがメモリに載る。
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, rows, cols, south, west, dlat, dlon, nodata = \
+                _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f'標高グリッドの形式が不正です: {path}')
+
+        self.rows, self.cols = rows, cols
+        self.south, self.west = south, west
+        self.dlat, self.dlon = dlat, dlon
+        self.nodata = nodata
+        self.values = np.asarray(np.memmap(path, dtype='<f4', mode='r', offset=HEADER_SIZE, shape=(rows, cols)))
+
+    @property
+    def bounds(self):
+        """(南端, 北端, 西端, 東端)"""
+        return (self.south, self.south + (self.rows - 1) * self.dlat,
+                self.west, self.west + (self.cols - 1) * self.dlon)
+
+    def sample(self, lats, lons):
+        """各地点の標高を双線形補間で求める（範囲外・欠測はNaN）"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+
+        y = (lats - self.south) / self.dlat
+        x = (lons - self.west) / self.dlon
+        inside = (y >= 0) & (y <= self.rows - 1) & (x >= 0) & (x <= self.cols - 1)
+
+        # 右端・上端の点も補間できるよう、左下の格子は最大で1つ手前に止める
+        y0 = np.clip(np.floor(y), 0, max(self.rows - 2, 0)).astype(np.intp)
+        x0 = np.clip(np.floor(x), 0, max(self.cols - 2, 0)).astype(np.intp)
+        y1 = np.minimum(y0 + 1, self.rows - 1)
+        x1 = np.minimum(x0 + 1, self.cols - 1)
+        fy = np.clip(y - y0, 0, 1)
+        fx = np.clip(x - x0, 0, 1)
+
+        v00 = self.values[y0, x0]
+        v01 = self.values[y0, x1]
+        v10 = self.values[y1, x0]
+        v11 = self.values[y1, x1]
+        result = ((v00 * (1 - fx) + v01 * fx) * (1 - fy)
+                  + (v10 * (1 - fx) + v11 * fx) * fy)
+
+        missing = ~inside
+        for corner in (v00, v01, v10, v11):
+            missing |= corner == self.nodata
+        result[missing] = np.nan
+        return result
+
+    def elevation(self, lat, lon):
+        """1地点の標高（範囲外・欠測はNone）"""
+        value = float(self.sample([lat], [lon])[0])
+        return None if math.isnan(value) else value
+
+    def profile(self, coords):
+        """[[lat, lon], ...] のルートの標高と、出発地点からの累積獲得標高"""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        elevations = self.sample(coords[:, 0], coords[:, 1])
+        climbs = np.clip(np.diff(elevations), 0, None)
+        cumulative_gain = np.concatenate([[0.0], np.cumsum(climbs)])
+        return elevations, cumulative_gain
+
+
+def _tile_to_lat(y, zoom):
+    """タイル座標（小数可）の y から緯度を求める（Webメルカトル）"""
+    n = math.pi - 2 * math.pi * y / 2 ** zoom
+    return math.degrees(math.atan(math.sinh(n)))
+
+
+def _lat_to_tile(lat, zoom):
+    lat_rad = np.radians(lat)
+    return (1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / math.pi) / 2 * 2 ** zoom
+
+
+def read_gsi_tile(path):
+    """国土地理院の標高タイル（テキスト形式）を 256x256 の配列として読む（欠測はNaN）"""
+    values = np.full((GSI_TILE_SIZE, GSI_TILE_SIZE), np.nan, dtype=np.float32)
+    with open(path, encoding='utf-8') as f:
+        for row, line in enumerate(f):
+            if row >= GSI_TILE_SIZE:
+                break
+            cells = line.strip().split(',')
+            values[row, :len(cells)] = [np.nan if cell == GSI_NODATA else float(cell) for cell in cells]
+    return values
+
+
+def convert_gsi_tiles(tile_dir, zoom, output_path):
+    """{zoom}/{x}/{y}.txt 形式の国土地理院タイルを緯度経度グリッドに変換して保存"""
+    paths = glob.glob(os.path.join(tile_dir, str(zoom), '*', '*.txt'))
+    if not paths:
+        raise FileNotFoundError(f'タイルが見つかりません: {tile_dir}/{zoom}')
+
+    tiles = {}
+    for path in paths:
+        x = int(os.path.basename(os.path.dirname(path)))
+        y = int(os.path.splitext(os.path.basename(path))[0])
+        tiles[(x, y)] = path
+    xs = [x for x, _ in tiles]
+    ys = [y for _, y in tiles]
+    x_min, x_max, y_min, y_max = min(xs), max(xs), min(ys), max(ys)
+
+    # タイルを1枚の画像（北が上）につなぐ
+    mosaic = np.full(((y_max - y_min + 1) * GSI_TILE_SIZE, (x_max - x_min + 1) * GSI_TILE_SIZE),
+                     np.nan, dtype=np.float32)
+    for (x, y), path in tiles.items():
+        top = (y - y_min) * GSI_TILE_SIZE
+        left = (x - x_min) * GSI_TILE_SIZE
+        mosaic[top:top + GSI_TILE_SIZE, left:left + GSI_TILE_SIZE] = read_gsi_tile(path)
+
+    # 経度方向はメルカトルでも等間隔、緯度方向は画素の中心を等間隔の緯度に取り直す
+    pixels = 2 ** zoom * GSI_TILE_SIZE
+    dlon = 360.0 / pixels
+    west = x_min * GSI_TILE_SIZE * dlon - 180 + dlon / 2
+    north = _tile_to_lat(y_min + 0.5 / GSI_TILE_SIZE, zoom)
+    south = _tile_to_lat(y_max + 1 - 0.5 / GSI_TILE_SIZE, zoom)
+    center_y = (y_min + y_max + 1) / 2
+    dlat = _tile_to_lat(center_y, zoom) - _tile_to_lat(center_y + 1 / GSI_TILE_SIZE, zoom)
+
+    rows = int((north - south) / dlat) + 1
+    lats = south + np.arange(rows) * dlat
+    pixel_rows = np.round(_lat_to_tile(lats, zoom) * GSI_TILE_SIZE - 0.5).astype(np.intp) - y_min * GSI_TILE_SIZE
+    pixel_rows = np.clip(pixel_rows, 0, mosaic.shape[0] - 1)
+
+    write_grid(output_path, mosaic[pixel_rows], south, west, dlat, dlon)
+    return rows, mosaic.shape[1]
+
+
+def main():
+    if len(sys.argv) != 4:
+        print('使い方: python -m walknav.elevation <タイルのディレクトリ> <ズームレベル> <出力.dem>')
+        sys.exit(1)
+
+    rows, cols = convert_gsi_tiles(sys.argv[1], int(sys.argv[2]), sys.argv[3])
+    print(f'グリッド: {rows} x {cols}')
+
+
+if __name__ == '__main__':
+    main()
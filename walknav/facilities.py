@@ -0,0 +1,112 @@
+"""ルート沿いの施設検索
+
+トイレ・コンビニ・ベンチ・AED・交番などの施設データ（CSV）を空間インデックスに
+読み込み、ルートの折れ線から指定距離以内にある施設を、ルートからの距離と
+出発地点からの道のり（ルートに沿った距離）付きで返す。
+"""
+import csv
+import math
+
+import numpy as np
+
+from .geo_distance import EARTH_RADIUS_KM, segment_distances
+from .spatial_index import SpatialIndex
+
+# 緯度1度あたりの距離（m）
+M_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM * 1000 / 180
+
+
+def load_facilities_csv(path):
+    """name, type, lat, lon 列を持つCSVから施設データを配列で読み込む"""
+    names, types, lats, lons = [], [], [], []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lon = float(row['lat']), float(row['lon'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            names.append(row.get('name') or '')
+            types.append(row.get('type') or '')
+            lats.append(lat)
+            lons.append(lon)
+    return names, types, lats, lons
+
+
+class FacilityIndex:
+    """施設の空間インデックス
+
+    施設の種別は種別名の番号（uint16）で持ち、大量の施設でも辞書を作らない。
+    """
+
+    def __init__(self, names, types, lats, lons, cell_deg=0.002):
+        self.names = np.asarray(names, dtype=object)
+        self.type_names, type_codes = np.unique(np.asarray(types, dtype=object), return_inverse=True)
+        self.type_codes = type_codes.astype(np.uint16)
+        self._index = SpatialIndex(lats, lons, cell_deg=cell_deg)
+
+    @classmethod
+    def from_csv(cls, path, cell_deg=0.002):
+        return cls(*load_facilities_csv(path), cell_deg=cell_deg)
+
+    @classmethod
+    def from_points(cls, points, cell_deg=0.002):
+        """name, type, lat, lon を持つ辞書のリストから構築"""
+        return cls([p['name'] for p in points], [p['type'] for p in points],
+                   [p['lat'] for p in points], [p['lon'] for p in points], cell_deg=cell_deg)
+
+    def __len__(self):
+        return len(self._index)
+
+    def along_route(self, coords, buffer_m=100, types=None, limit=None):
+        """ルートから buffer_m 以内の施設を、出発地点からの道のりが近い順に検索
+
+        結果の distance_m はルートからの距離、along_m は最寄りの地点までの
+        ルートに沿った道のり（いずれもm）。
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if len(coords) == 0 or len(self) == 0:
+            return []
+        if len(coords) == 1:
+            coords = np.vstack([coords, coords])
+
+        lats, lons = coords[:, 0], coords[:, 1]
+        points, segments = self._index.corridor_pairs(lats, lons, buffer_m / 1000)
+        if types is not None:
+            wanted = np.isin(self.type_names, list(types))[self.type_codes[points]]
+            points, segments = points[wanted], segments[wanted]
+        if not len(points):
+            return []
+
+        # ルート付近を平面とみなしてmに換算
+        m_per_deg_lon = M_PER_DEG_LAT * math.cos(math.radians(float(lats.mean())))
+        xs, ys = lons * m_per_deg_lon, lats * M_PER_DEG_LAT
+        cumulative = np.concatenate([[0.0], np.cumsum(segment_distances(lats, lons) * 1000)])
+
+        # 施設と近くの区間の組ごとに、垂線の足（区間の外なら端点）までの距離を求める
+        ax, ay = xs[segments], ys[segments]
+        dx, dy = xs[segments + 1] - ax, ys[segments + 1] - ay
+        px = self._index.lons[points] * m_per_deg_lon
+        py = self._index.lats[points] * M_PER_DEG_LAT
+        t = np.clip(((px - ax) * dx + (py - ay) * dy) / np.maximum(dx * dx + dy * dy, 1e-12), 0.0, 1.0)
+        dist = np.hypot(ax + t * dx - px, ay + t * dy - py)
+        along = cumulative[segments] + t * (cumulative[segments + 1] - cumulative[segments])
+
+        # 施設ごとに最も近い区間の組を1つ残す（並べ替えを避け、施設番号の配列に書き込んで選ぶ）
+        nearest = np.full(len(self), np.inf)
+        np.minimum.at(nearest, points, dist)
+        best = np.nonzero((dist == nearest[points]) & (dist <= buffer_m))[0]
+        winner = np.empty(len(self), dtype=np.int64)
+        winner[points[best]] = best
+        best = best[winner[points[best]] == best]
+        best = best[np.argsort(along[best], kind='stable')]
+        if limit is not None:
+            best = best[:limit]
+
+        return [{
+            'name': self.names[i],
+            'type': self.type_names[self.type_codes[i]],
+            'lat': float(self._index.lats[i]),
+            'lon': float(self._index.lons[i]),
+            'distance_m': float(dist[j]),
+            'along_m': float(along[j])
+        } for i, j in zip(points[best], best)]
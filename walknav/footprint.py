@@ -0,0 +1,153 @@
+"""セッション状態のメモリ使用量の計測と上限
+
+セッション状態の各キーが参照しているオブジェクトの合計サイズ（deep size）を
+測り、全セッション分を集計する。キーごとの上限を超えたセッションは、散歩経路の
+古い点を間引いたり、生成済みルートの詳細情報や選ばれなかったルートを捨てたり
+して上限内に収める。
+"""
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+# プロセス全体で共有されるのでセッションの使用量に数えないもの
+_SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, threading.Lock().__class__, threading.Thread)
+
+
+def deep_sizeof(obj, max_objects=200000):
+    """obj から辿れるオブジェクトの合計サイズ（バイト）
+
+    同じオブジェクトは1回だけ数える。クラス・モジュール・関数などは数えない。
+    辿るオブジェクトが max_objects を超えたらそこまでの合計を返す。
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < max_objects:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SHARED_TYPES):
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, np.ndarray):
+            # 他の配列のビューなら元の配列を数える（メモリマップは数えない）
+            total += sys.getsizeof(item)
+            if isinstance(item.base, np.ndarray):
+                stack.append(item.base)
+            continue
+
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, bytearray, int, float, complex, bool)) or item is None:
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            attributes = getattr(item, '__dict__', None)
+            if attributes is not None:
+                stack.append(attributes)
+            for slot in getattr(type(item), '__slots__', ()):
+                if hasattr(item, slot):
+                    stack.append(getattr(item, slot))
+    return total
+
+
+def state_footprint(state, keys=None):
+    """セッション状態のキーごとのサイズ（バイト）
+
+    キーごとに別々に測るので、複数のキーから参照されているオブジェクト
+    （選択中のルートなど）はそれぞれのキーに数える。
+    """
+    keys = list(state.keys()) if keys is None else keys
+    return {key: deep_sizeof(state[key]) for key in keys if key in state}
+
+
+def downsample_track(track, keep_recent, max_points):
+    """経路の点数が max_points を超えたら、直近 keep_recent 点より古い部分を間引く
+
+    古い部分は等間隔に間引き、最初の点は残す。間引いた場合は新しい TrackBuffer を、
+    そうでなければ元の track を返す。
+    """
+    size = len(track)
+    if size <= max_points:
+        return track
+
+    keep_recent = min(keep_recent, max_points - 1)
+    old_count = size - keep_recent
+    old_budget = max(1, max_points - keep_recent)
+    stride = -(-old_count // old_budget)  # 切り上げ
+    indices = np.concatenate([np.arange(0, old_count, stride), np.arange(old_count, size)])
+    return track.take(indices)
+
+
+def trim_routes(state, budget_bytes):
+    """生成済みルートを上限内に収める（削除した件数を返す）
+
+    まず表示時に作った詳細情報を選択中のルート以外から捨て、それでも超える場合は
+    選択中でないルートを評価の低い（一覧の後ろの）ものから捨てる。
+    """
+    selected = state.get('selected_route')
+    selected_id = selected['id'] if selected else None
+    routes = state.get('generated_routes') or []
+    details = state.get('route_details') or {}
+
+    def size():
+        return deep_sizeof(routes) + deep_sizeof(details)
+
+    removed = 0
+    for route_id in [route_id for route_id in details if route_id != selected_id]:
+        if size() <= budget_bytes:
+            return removed
+        del details[route_id]
+        removed += 1
+
+    for route in reversed(list(routes)):
+        if size() <= budget_bytes:
+            break
+        if route['id'] != selected_id:
+            routes.remove(route)
+            removed += 1
+    return removed
+
+
+class FootprintRegistry:
+    """全セッションのメモリ使用量の集計（一定時間報告のないセッションは除く）"""
+
+    def __init__(self, ttl=300, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def report(self, session_id, footprint):
+        """セッションのキーごとのサイズを記録"""
+        with self._lock:
+            self._sessions[session_id] = (dict(footprint), self._clock())
+
+    def _live(self):
+        now = self._clock()
+        expired = [sid for sid, (_, seen_at) in self._sessions.items() if now - seen_at > self.ttl]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return self._sessions
+
+    def summary(self):
+        """キーごとの全セッション合計・最大と、セッション数・総量"""
+        with self._lock:
+            sessions = self._live()
+            keys = {}
+            for footprint, _ in sessions.values():
+                for key, size in footprint.items():
+                    total, largest = keys.get(key, (0, 0))
+                    keys[key] = (total + size, max(largest, size))
+            return {
+                'sessions': len(sessions),
+                'total_bytes': sum(total for total, _ in keys.values()),
+                'keys': {key: {'total_bytes': total, 'max_bytes': largest}
+                         for key, (total, largest) in sorted(keys.items(), key=lambda kv: -kv[1][0])}
+            }
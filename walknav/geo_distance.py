@@ -0,0 +1,159 @@
+import numpy as np
+
+# 地球の平均半径（km）
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS84楕円体
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+# 計算方式: haversine（高速・球面近似）, vincenty（楕円体・反復計算）, karney（楕円体・厳密）
+METHODS = ('haversine', 'vincenty', 'karney')
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    """haversine公式による距離（km、ブロードキャスト対応）"""
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(lon2) - np.radians(lon1)
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+
+
+def _karney_km(lat1, lon1, lat2, lon2):
+    """Karneyのアルゴリズムによる厳密な楕円体距離（km、ブロードキャスト対応）"""
+    from geographiclib.geodesic import Geodesic
+
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(lat1, lon1, lat2, lon2)
+    inverse = Geodesic.WGS84.Inverse
+    out = np.empty(lat1.shape, dtype=np.float64)
+    flat = out.reshape(-1)
+    for i, args in enumerate(zip(lat1.ravel(), lon1.ravel(), lat2.ravel(), lon2.ravel())):
+        flat[i] = inverse(*args, Geodesic.DISTANCE)['s12']
+    return out / 1000
+
+
+def _vincenty_km(lat1, lon1, lat2, lon2, max_iter=200, tol=1e-12):
+    """Vincenty公式による楕円体距離（km、ブロードキャスト対応）
+
+    対蹠点付近など収束しない組み合わせはKarneyの方法で計算し直す。
+    """
+    lat1, lon1, lat2, lon2 = (np.asarray(v, dtype=np.float64)
+                              for v in np.broadcast_arrays(lat1, lon1, lat2, lon2))
+    f = WGS84_F
+
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(U1), np.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam,
+                                 cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0,
+                                 cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos_sq_alpha == 0, 0.0,
+                                    cos_sigma - 2 * sin_u1 * sin_u2 / cos_sq_alpha)
+            C = f / 16 * cos_sq_alpha * (4 + f * (4 - 3 * cos_sq_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            converged = np.abs(lam - lam_prev) < tol
+            if converged.all():
+                break
+
+        u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        ))
+        distance = WGS84_B * A * (sigma - delta_sigma) / 1000
+
+    failed = ~converged | ~np.isfinite(distance)
+    if failed.any():
+        distance = np.array(distance)
+        distance[failed] = _karney_km(lat1[failed], lon1[failed], lat2[failed], lon2[failed])
+    return distance
+
+
+_DISTANCE_FUNCS = {
+    'haversine': _haversine_km,
+    'vincenty': _vincenty_km,
+    'karney': _karney_km,
+}
+
+
+def _distance_func(method):
+    """計算方式に対応する距離関数を取得"""
+    try:
+        return _DISTANCE_FUNCS[method]
+    except KeyError:
+        raise ValueError(f"未対応の距離計算方式です: {method}（{', '.join(METHODS)} のいずれか）")
+
+
+def distance_km(lat1, lon1, lat2, lon2, method='haversine'):
+    """2点間の距離（km）"""
+    return float(_distance_func(method)(lat1, lon1, lat2, lon2))
+
+
+def distance_m(lat1, lon1, lat2, lon2, method='haversine'):
+    """2点間の距離（m）"""
+    return distance_km(lat1, lon1, lat2, lon2, method) * 1000
+
+
+def distance_to_many(lat, lon, lats, lons, method='haversine'):
+    """1点から複数点への距離を一括計算（km配列）"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    return _distance_func(method)(lat, lon, lats, lons)
+
+
+def elementwise_distances(lats1, lons1, lats2, lons2, method='haversine'):
+    """同じ長さの2つの地点群について、対応する点同士の距離を一括計算（km配列）"""
+    return _distance_func(method)(
+        np.asarray(lats1, dtype=np.float64), np.asarray(lons1, dtype=np.float64),
+        np.asarray(lats2, dtype=np.float64), np.asarray(lons2, dtype=np.float64)
+    )
+
+
+def pairwise_distances(lats1, lons1, lats2=None, lons2=None, method='haversine'):
+    """2つの地点群の全組み合わせの距離行列（km、形状は (len(lats1), len(lats2))）"""
+    lats1 = np.asarray(lats1, dtype=np.float64)
+    lons1 = np.asarray(lons1, dtype=np.float64)
+    if lats2 is None:
+        lats2, lons2 = lats1, lons1
+    lats2 = np.asarray(lats2, dtype=np.float64)
+    lons2 = np.asarray(lons2, dtype=np.float64)
+    return _distance_func(method)(lats1[:, None], lons1[:, None], lats2[None, :], lons2[None, :])
+
+
+def segment_distances(lats, lons, method='haversine'):
+    """経路の各区間の距離を一括計算（km配列、長さは点数-1）"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if len(lats) < 2:
+        return np.zeros(0, dtype=np.float64)
+    return _distance_func(method)(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+
+def path_length_km(coords, method='haversine'):
+    """[[lat, lon], ...] 形式の経路の総距離（km）"""
+    if len(coords) < 2:
+        return 0.0
+    arr = np.asarray(coords, dtype=np.float64)
+    return float(segment_distances(arr[:, 0], arr[:, 1], method).sum())
+
@@ -0,0 +1,127 @@
+import math
+
+from .geo_distance import EARTH_RADIUS_KM
+
+# 緯度1度あたりの距離（m）
+M_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM * 1000 / 180
+
+
+class GpsSmoother:
+    """GPS測位列の平滑化フィルター
+
+    測位精度で重み付けしたカルマンフィルターで位置を平滑化し、歩行ではあり得ない
+    速度になる測位は外れ値として捨てる。前回出力した点から min_step_m 以上
+    移動したときだけ点を出力するので、静止中の揺らぎは距離に加算されず、
+    ゆっくりした移動は複数の測位にわたって積み上げられる。
+
+    状態はインスタンスに保持されるので、再実行ごとに届いた測位をまとめて
+    feed() に渡せばよい。
+    """
+
+    def __init__(self, max_speed_mps=3.5, process_noise_mps=1.5, min_step_m=10.0,
+                 max_consecutive_rejects=5):
+        self.max_speed_mps = max_speed_mps
+        self.process_noise_mps = process_noise_mps
+        self.min_step_m = min_step_m
+        self.max_consecutive_rejects = max_consecutive_rejects
+
+        # フィルターの推定値（緯度経度）と分散（m^2）
+        self.lat = None
+        self.lon = None
+        self.variance = None
+        self.timestamp = None
+
+        # 最後に出力した点
+        self._last_emitted = None
+        self._consecutive_rejects = 0
+
+        self.accepted = 0
+        self.rejected = 0
+
+    def feed(self, fixes):
+        """測位の列を受け取り、平滑化された移動点を順に返すジェネレーター
+
+        出力する点は元の測位の属性を引き継ぎ、lat / lon / accuracy を平滑化後の値に
+        置き換え、前回出力点からの移動距離 distance_m を加えたもの。
+        """
+        for fix in fixes:
+            if not self._update(fix):
+                continue
+
+            point = self._emit(fix)
+            if point is not None:
+                yield point
+
+    def _offset_m(self, lat, lon):
+        """現在の推定値から見た座標のずれ（北方向, 東方向のm）"""
+        north = (lat - self.lat) * M_PER_DEG_LAT
+        east = (lon - self.lon) * M_PER_DEG_LAT * math.cos(math.radians(self.lat))
+        return north, east
+
+    def _reset(self, fix):
+        """測位でフィルターを初期化"""
+        self.lat = fix['lat']
+        self.lon = fix['lon']
+        self.variance = float(fix.get('accuracy') or 10) ** 2
+        self.timestamp = fix['timestamp']
+        self._consecutive_rejects = 0
+
+    def _update(self, fix):
+        """測位でフィルターを更新（外れ値として捨てた場合はFalse）"""
+        accuracy = float(fix.get('accuracy') or 10)
+
+        if self.lat is None:
+            self._reset(fix)
+            self.accepted += 1
+            return True
+
+        dt = fix['timestamp'] - self.timestamp
+        if dt <= 0:
+            # 順序の乱れた・重複した測位は使わない
+            self.rejected += 1
+            return False
+
+        # 誤差（測位と推定値の3σ）を差し引いても速すぎる移動は外れ値とする
+        north, east = self._offset_m(fix['lat'], fix['lon'])
+        jump = math.hypot(north, east) - 3 * math.sqrt(accuracy ** 2 + self.variance)
+        if jump / dt > self.max_speed_mps:
+            self.rejected += 1
+            self._consecutive_rejects += 1
+            # 外れ値が続く場合は推定値の方がずれているとみなして測位に合わせ直す
+            if self._consecutive_rejects >= self.max_consecutive_rejects:
+                self._reset(fix)
+                self._last_emitted = None
+                return True
+            return False
+
+        # 時間経過に応じて不確かさを増やしてから、測位精度で重み付けして更新
+        self.variance += dt * self.process_noise_mps ** 2
+        gain = self.variance / (self.variance + accuracy ** 2)
+        self.lat += gain * (fix['lat'] - self.lat)
+        self.lon += gain * (fix['lon'] - self.lon)
+        self.variance *= 1 - gain
+        self.timestamp = fix['timestamp']
+        self._consecutive_rejects = 0
+        self.accepted += 1
+        return True
+
+    def _emit(self, fix):
+        """前回出力点から十分に移動していれば出力点を作成"""
+        if self._last_emitted is None:
+            distance = 0.0
+        else:
+            north, east = self._offset_m(self._last_emitted['lat'], self._last_emitted['lon'])
+            distance = math.hypot(north, east)
+            if distance < self.min_step_m:
+                return None
+
+        point = dict(fix)
+        point.update({
+            'lat': self.lat,
+            'lon': self.lon,
+            'accuracy': round(math.sqrt(self.variance), 1),
+            'timestamp': self.timestamp,
+            'distance_m': distance
+        })
+        self._last_emitted = point
+        return point
@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS walks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    walk_date TEXT NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    route_name TEXT,
+    planned_distance_km REAL,
+    actual_distance_km REAL NOT NULL DEFAULT 0,
+    duration_s REAL NOT NULL DEFAULT 0,
+    avg_speed_kmh REAL NOT NULL DEFAULT 0,
+    calories_kcal REAL NOT NULL DEFAULT 0,
+    checkpoints INTEGER NOT NULL DEFAULT 0,
+    locations_visited INTEGER NOT NULL DEFAULT 0,
+    rating INTEGER,
+    comment TEXT,
+    photos INTEGER NOT NULL DEFAULT 0,
+    path_polyline TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_walks_user_date ON walks (user_id, walk_date, id);
+
+CREATE TABLE IF NOT EXISTS user_totals (
+    user_id TEXT PRIMARY KEY,
+    total_walks INTEGER NOT NULL DEFAULT 0,
+    total_distance_km REAL NOT NULL DEFAULT 0,
+    total_duration_s REAL NOT NULL DEFAULT 0,
+    total_calories_kcal REAL NOT NULL DEFAULT 0
+);
+"""
+
+_WALK_COLUMNS = (
+    'walk_date', 'start_time', 'end_time', 'route_name', 'planned_distance_km',
+    'actual_distance_km', 'duration_s', 'avg_speed_kmh', 'calories_kcal',
+    'checkpoints', 'locations_visited', 'rating', 'comment', 'photos', 'path_polyline'
+)
+
+# 既存のデータベースにない列を追加する（列名, 型）
+_ADDED_COLUMNS = (
+    ('path_polyline', 'TEXT'),
+)
+
+
+class WalkHistoryStore:
+    """散歩記録を保存するSQLiteストア
+
+    記録は数値の列で保存し（歩いた経路は Encoded Polyline 形式の文字列）、
+    ユーザーごとの累計は保存時に同じトランザクションで更新しておく。
+    履歴一覧は (user_id, walk_date) の索引から新しい順に件数を絞って読むので、記録がいくら増えても表示にかかる時間は変わらない。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+            existing = {row['name'] for row in self._conn.execute('PRAGMA table_info(walks)')}
+            for column, column_type in _ADDED_COLUMNS:
+                if column not in existing:
+                    self._conn.execute(f'ALTER TABLE walks ADD COLUMN {column} {column_type}')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_walk(self, user_id, walk):
+        """散歩記録を保存して累計を更新（記録のIDを返す）"""
+        # 記録にない列は書かずにスキーマの既定値にする（NULL を入れると NOT NULL に反する）
+        columns = [column for column in _WALK_COLUMNS if walk.get(column) is not None]
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"INSERT INTO walks (user_id, {''.join(column + ', ' for column in columns)}created_at) "
+                f"VALUES (?, {'?, ' * len(columns)}?)",
+                [user_id, *(walk[column] for column in columns), time.time()]
+            )
+            self._conn.execute(
+                """
+                INSERT INTO user_totals
+                    (user_id, total_walks, total_distance_km, total_duration_s, total_calories_kcal)
+                VALUES (?, 1, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total_walks = total_walks + 1,
+                    total_distance_km = total_distance_km + excluded.total_distance_km,
+                    total_duration_s = total_duration_s + excluded.total_duration_s,
+                    total_calories_kcal = total_calories_kcal + excluded.total_calories_kcal
+                """,
+                (user_id, walk.get('actual_distance_km') or 0,
+                 walk.get('duration_s') or 0, walk.get('calories_kcal') or 0)
+            )
+            return cursor.lastrowid
+
+    def recent_walks(self, user_id, limit=10):
+        """新しい順に散歩記録を取得"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM walks WHERE user_id = ? "
+                "ORDER BY walk_date DESC, id DESC LIMIT ?",
+                (user_id, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def walks_between(self, user_id, start_date, end_date):
+        """期間内（YYYY-MM-DD、両端を含む）の散歩記録を日付順に取得"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM walks WHERE user_id = ? AND walk_date BETWEEN ? AND ? "
+                "ORDER BY walk_date, id",
+                (user_id, start_date, end_date)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def totals(self, user_id):
+        """ユーザーの累計（回数・距離・時間・カロリー）を取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT total_walks, total_distance_km, total_duration_s, total_calories_kcal "
+                "FROM user_totals WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        if row is None:
+            return {'total_walks': 0, 'total_distance_km': 0.0,
+                    'total_duration_s': 0.0, 'total_calories_kcal': 0.0}
+        return dict(row)
+
+    def clear(self, user_id):
+        """ユーザーの散歩記録と累計を削除"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM walks WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM user_totals WHERE user_id = ?", (user_id,))
@@ -0,0 +1,335 @@
+"""位置情報の取得と地域情報の分析
+
+GPS位置の取得（デモ用のシミュレーション）と、座標からの地域・最寄り駅・
+標高・安全度・歩きやすさの算出を行う。
+"""
+import logging
+import random
+import time
+from datetime import datetime
+
+from . import geohash
+from .profiling import profiled
+from .resources import (LOCATION_CACHE_PRECISION, get_elevation_grid, get_landmark_index,
+                        get_location_cache, get_region_index, get_score_raster, get_station_index)
+
+logger = logging.getLogger(__name__)
+
+
+@profiled()
+def get_detailed_location_info(lat, lon):
+    """詳細な位置情報を取得"""
+    try:
+        # 同じジオハッシュセル内の地域情報はキャッシュから再利用
+        cache_key = geohash.encode(lat, lon, LOCATION_CACHE_PRECISION)
+        area_details = get_location_cache().get_or_compute(
+            cache_key, lambda: get_area_details(lat, lon)
+        )
+
+        return {
+            'coordinates': {'lat': lat, 'lon': lon},
+            **area_details,
+            'timestamp': datetime.now().isoformat()
+        }
+    except Exception:
+        logger.exception('位置情報の詳細取得に失敗')
+        return None
+
+
+def get_area_details(lat, lon):
+    """座標周辺の地域情報を計算（座標・時刻以外の詳細情報）"""
+    # 実際のアプリケーションでは逆ジオコーディングAPIを使用
+    # ここでは詳細な位置情報をシミュレート
+
+    # 緯度経度から詳細な地域情報を生成
+    location_info = analyze_coordinates(lat, lon)
+
+    # 近隣の詳細情報を取得
+    neighborhood_info = get_neighborhood_details(lat, lon)
+
+    # 標高情報を取得
+    elevation = get_elevation(lat, lon)
+
+    return {
+        'prefecture': location_info['prefecture'],
+        'city': location_info['city'],
+        'ward': location_info['ward'],
+        'district': location_info['district'],
+        'neighborhood': location_info['neighborhood'],
+        'nearest_station': neighborhood_info['nearest_station'],
+        'nearest_landmark': neighborhood_info['nearest_landmark'],
+        'elevation': elevation,
+        'area_type': location_info['area_type'],
+        'population_density': location_info['population_density'],
+        'safety_rating': calculate_area_safety_rating(lat, lon),
+        'walkability_score': calculate_walkability_score(lat, lon)
+    }
+
+
+def analyze_coordinates(lat, lon):
+    """座標から詳細な地域情報を分析"""
+    # 座標を含む地域をポリゴンインデックスで特定
+    info = get_region_index().lookup(lat, lon)
+
+    if info:
+        # より詳細な区分を計算
+        ward = get_ward_from_coordinates(lat, lon, info['city'])
+        district = get_district_from_coordinates(lat, lon)
+        neighborhood = get_neighborhood_from_coordinates(lat, lon)
+
+        return {
+            'prefecture': info['prefecture'],
+            'city': info['city'],
+            'ward': ward,
+            'district': district,
+            'neighborhood': neighborhood,
+            'area_type': info['area_type'],
+            'population_density': info['population_density']
+        }
+
+    # デフォルト値（該当地域が見つからない場合）
+    return {
+        'prefecture': '不明',
+        'city': f'座標地点 ({lat:.4f}, {lon:.4f})',
+        'ward': '未特定',
+        'district': '未特定',
+        'neighborhood': '未特定',
+        'area_type': '一般住宅地',
+        'population_density': 'medium'
+    }
+
+
+def get_ward_from_coordinates(lat, lon, city):
+    """座標から区・町を特定"""
+    # 簡易的な区分け（実際のアプリではより詳細なデータを使用）
+    lat_decimal = lat - int(lat)
+    lon_decimal = lon - int(lon)
+
+    if '川崎' in city:
+        if lat_decimal < 0.55:
+            return '川崎区'
+        elif lat_decimal < 0.57:
+            return '幸区'
+        elif lat_decimal < 0.59:
+            return '中原区'
+        else:
+            return '高津区'
+    elif '横浜' in city:
+        if lat_decimal < 0.45:
+            return '西区'
+        elif lat_decimal < 0.47:
+            return '中区'
+        else:
+            return '港北区'
+    elif '東京' in city or '新宿' in city or '渋谷' in city:
+        if lon_decimal < 0.72:
+            return '西部'
+        elif lon_decimal < 0.75:
+            return '中央部'
+        else:
+            return '東部'
+
+    return '中央部'
+
+
+def get_district_from_coordinates(lat, lon):
+    """座標から地区を特定"""
+    # 緯度経度の小数部を使用して地区を推定
+    lat_decimal = (lat * 1000) % 100
+    lon_decimal = (lon * 1000) % 100
+
+    districts = ['一丁目', '二丁目', '三丁目', '四丁目', '五丁目']
+    district_index = int((lat_decimal + lon_decimal) / 40) % len(districts)
+
+    return districts[district_index]
+
+
+def get_neighborhood_from_coordinates(lat, lon):
+    """座標から近隣地域を特定"""
+    # 座標に基づいて近隣の特徴的な地域名を生成
+    lat_hash = int((lat * 10000) % 1000)
+    lon_hash = int((lon * 10000) % 1000)
+
+    prefixes = ['新', '本', '東', '西', '南', '北', '中']
+    suffixes = ['町', '通り', '台', '丘', '坂', '橋']
+
+    prefix = prefixes[lat_hash % len(prefixes)]
+    suffix = suffixes[lon_hash % len(suffixes)]
+
+    return f"{prefix}{suffix}"
+
+
+def get_neighborhood_details(lat, lon):
+    """近隣の詳細情報を取得"""
+    # 最寄り駅を計算
+    nearest_station = find_nearest_station(lat, lon)
+
+    # 最寄りランドマークを計算
+    nearest_landmark = find_nearest_landmark(lat, lon)
+
+    return {
+        'nearest_station': nearest_station,
+        'nearest_landmark': nearest_landmark
+    }
+
+
+def find_nearest_station(lat, lon):
+    """最寄り駅を検索"""
+    nearest = get_station_index().nearest(lat, lon)
+
+    return {
+        'name': nearest['name'] if nearest else None,
+        'distance': f"{nearest['distance_km'] if nearest else float('inf'):.1f}km"
+    }
+
+
+def find_nearest_landmark(lat, lon):
+    """最寄りランドマークを検索"""
+    nearest = get_landmark_index().nearest(lat, lon)
+
+    return {
+        'name': nearest['name'] if nearest else None,
+        'distance': f"{nearest['distance_km'] if nearest else float('inf'):.1f}km"
+    }
+
+
+def get_elevation(lat, lon):
+    """標高を取得"""
+    # 標高グリッドがあればその値を使う
+    elevation_grid = get_elevation_grid()
+    if elevation_grid is not None:
+        elevation = elevation_grid.elevation(lat, lon)
+        if elevation is not None:
+            return max(0, int(round(elevation)))
+
+    # 簡易的な標高計算（グリッドの範囲外・データなしの場合）
+    base_elevation = 10  # 海抜10mをベースとする
+
+    # 座標に基づいて標高を推定
+    lat_factor = (lat - 35.0) * 100
+    lon_factor = (lon - 139.0) * 50
+
+    elevation = base_elevation + lat_factor + lon_factor
+    return max(0, int(elevation))
+
+
+def lookup_area_scores(lat, lon):
+    """安全度・歩きやすさのラスターを参照（データがなければNone）"""
+    score_raster = get_score_raster()
+    if score_raster is None:
+        return None
+    return score_raster.lookup(lat, lon)
+
+
+def calculate_route_area_scores(coords, location_info):
+    """ルート全区間の安全度・歩きやすさ（ラスターがなければ出発地点の値）"""
+    score_raster = get_score_raster()
+    if score_raster is not None:
+        summary = score_raster.route_scores(coords)
+        if summary and summary['safety'] is not None and summary['walkability'] is not None:
+            return int(round(summary['safety'])), int(round(summary['walkability']))
+    return location_info['safety_rating'], location_info['walkability_score']
+
+
+def calculate_area_safety_rating(lat, lon):
+    """エリアの安全度を計算"""
+    # 事前計算したラスターがあればその値を使う
+    scores = lookup_area_scores(lat, lon)
+    if scores and scores['safety'] is not None:
+        return scores['safety']
+
+    # 人口密度、交通量、照明設備などを考慮した安全度計算
+    base_score = 80
+
+    # 座標に基づいて安全度を調整
+    lat_decimal = lat - int(lat)
+    lon_decimal = lon - int(lon)
+
+    # 市街地中心部は安全度が高い
+    if lat_decimal > 0.6 and lon_decimal > 0.7:
+        base_score += 10
+
+    # 工業地帯は安全度が低め
+    if lat_decimal < 0.53:
+        base_score -= 5
+
+    return min(100, max(60, base_score))
+
+
+def calculate_walkability_score(lat, lon):
+    """歩きやすさスコアを計算"""
+    scores = lookup_area_scores(lat, lon)
+    if scores and scores['walkability'] is not None:
+        return scores['walkability']
+
+    base_score = 75
+
+    # 座標に基づいて歩きやすさを調整
+    lat_decimal = lat - int(lat)
+    lon_decimal = lon - int(lon)
+
+    # 住宅街は歩きやすい
+    if 0.55 < lat_decimal < 0.65:
+        base_score += 15
+
+    # 商業地は歩きやすい
+    if lon_decimal > 0.72:
+        base_score += 10
+
+    return min(100, max(50, base_score))
+
+
+def get_precise_gps_location():
+    """高精度GPS位置を取得"""
+    # 実際の環境では、高精度GPSサービスを使用
+    # デモ用に詳細な位置情報をシミュレート
+
+    # より現実的な座標を生成
+    base_locations = [
+        # 川崎市の詳細エリア
+        {'lat': 35.5308, 'lon': 139.7029, 'name': '川崎駅周辺'},
+        {'lat': 35.5777, 'lon': 139.6565, 'name': '武蔵小杉'},
+        {'lat': 35.5647, 'lon': 139.6567, 'name': '等々力'},
+        {'lat': 35.5500, 'lon': 139.6800, 'name': '川崎区東部'},
+        {'lat': 35.5600, 'lon': 139.6500, 'name': '中原区'},
+
+        # 東京都の詳細エリア
+        {'lat': 35.6896, 'lon': 139.7006, 'name': '新宿'},
+        {'lat': 35.6580, 'lon': 139.7016, 'name': '渋谷'},
+        {'lat': 35.6812, 'lon': 139.7671, 'name': '東京駅'},
+        {'lat': 35.6289, 'lon': 139.7390, 'name': '品川'},
+
+        # 横浜市の詳細エリア
+        {'lat': 35.4657, 'lon': 139.6220, 'name': '横浜駅'},
+        {'lat': 35.4426, 'lon': 139.6496, 'name': '中華街'},
+    ]
+
+    # ランダムに基準位置を選択
+    base_location = random.choice(base_locations)
+
+    # 基準位置から50-200m以内の詳細な位置を生成
+    offset_lat = random.uniform(-0.002, 0.002)  # 約±200m
+    offset_lon = random.uniform(-0.002, 0.002)  # 約±200m
+
+    precise_lat = base_location['lat'] + offset_lat
+    precise_lon = base_location['lon'] + offset_lon
+
+    # GPS精度をシミュレート
+    accuracy = random.randint(3, 12)  # 3-12m の精度
+
+    return {
+        'lat': precise_lat,
+        'lon': precise_lon,
+        'accuracy': accuracy,
+        'timestamp': time.time(),
+        'base_location': base_location['name'],
+        'gps_quality': 'high' if accuracy < 8 else 'medium'
+    }
+
+
+
+def acquire_gps_location():
+    """GPS位置とその詳細情報を取得（バックグラウンドで実行）"""
+    gps_location = get_precise_gps_location()
+    detailed_location = get_detailed_location_info(gps_location['lat'], gps_location['lon'])
+    return gps_location, detailed_location
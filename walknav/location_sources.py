@@ -0,0 +1,301 @@
+"""散歩中の測位の取得元
+
+散歩の追跡は LocationSource.read(now) で前回以降の測位をまとめて受け取る。
+取得元は差し替えられるので、実機の代わりにシミュレーションや記録した経路の
+再生で散歩の流れを動かせる。時刻 now は呼び出し側が渡すので、UIなしでは
+仮想の時計で決定的に動かせる（乱数は取得元ごとの seed で固定する）。
+
+- RandomWalkSource: 向きを少しずつ変えながら歩く歩行者（既定）
+- ReplaySource: GPX / CSV に記録した経路を N 倍速で再生
+- RouteWalkerSource: 生成したルートに沿って歩く歩行者
+
+アプリで使う取得元は環境変数で選ぶ。
+
+    WALK_LOCATION_SOURCE=route streamlit run app.py
+    WALK_LOCATION_SOURCE=replay WALK_REPLAY_FILE=walk.gpx WALK_REPLAY_SPEED=10 streamlit run app.py
+"""
+import csv
+import math
+import os
+import random
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import numpy as np
+
+from .geo_distance import segment_distances
+from .gps_pipeline import M_PER_DEG_LAT
+
+LOCATION_SOURCE = os.environ.get('WALK_LOCATION_SOURCE', 'random')  # random / replay / route
+REPLAY_FILE = os.environ.get('WALK_REPLAY_FILE')
+REPLAY_SPEED = float(os.environ.get('WALK_REPLAY_SPEED', 1))
+
+# 1回の取得で返す測位の上限（1秒間隔で約1分ぶん）
+MAX_FIXES_PER_BATCH = 60
+
+# 再生する経路に精度がないときの値（m）
+DEFAULT_ACCURACY = 5.0
+
+
+class LocationSource:
+    """測位の取得元
+
+    read(now) は前回の呼び出し以降 now（UNIX時刻の秒）までの測位を、
+    lat / lon / accuracy / timestamp / base_location / gps_quality を持つ
+    辞書のリストで返す。最初の呼び出しでは開始地点の測位を1件返す。
+    """
+
+    finished = False  # これ以上測位が届かない（経路の再生が終わったなど）
+
+    def read(self, now):
+        raise NotImplementedError
+
+
+def _gps_quality(accuracy):
+    return 'high' if accuracy < 8 else 'medium'
+
+
+def _noisy_fix(rng, lat, lon, timestamp, base_location):
+    """真の位置に測位誤差を加えた測位（まれに大きく外れた測位が混ざる）"""
+    accuracy = rng.randint(3, 12)
+    error = accuracy if rng.random() > 0.02 else 150
+    m_per_deg_lon = M_PER_DEG_LAT * math.cos(math.radians(lat))
+    return {
+        'lat': lat + rng.gauss(0, error) / M_PER_DEG_LAT,
+        'lon': lon + rng.gauss(0, error) / m_per_deg_lon,
+        'accuracy': accuracy,
+        'timestamp': timestamp,
+        'base_location': base_location,
+        'gps_quality': _gps_quality(accuracy)
+    }
+
+
+class RandomWalkSource(LocationSource):
+    """向きを少しずつ変えながら歩行速度で移動する歩行者のシミュレーション
+
+    start（lat / lon / base_location を持つ辞書）を省略すると、最初の取得時に
+    get_precise_gps_location() の位置から歩き始める。
+    """
+
+    def __init__(self, start=None, seed=None):
+        self._rng = random.Random(seed)
+        self._start = start
+        self._sim = None
+
+    def read(self, now):
+        sim = self._sim
+        if sim is None:
+            start = self._start
+            if start is None:
+                from .location import get_precise_gps_location
+                start = get_precise_gps_location()
+            self._sim = {
+                'lat': start['lat'],
+                'lon': start['lon'],
+                'heading': self._rng.uniform(0, 2 * math.pi),
+                'timestamp': now,
+                'base_location': start.get('base_location', '')
+            }
+            accuracy = start.get('accuracy') or DEFAULT_ACCURACY
+            return [{
+                'lat': start['lat'],
+                'lon': start['lon'],
+                'accuracy': accuracy,
+                'timestamp': now,
+                'base_location': self._sim['base_location'],
+                'gps_quality': start.get('gps_quality') or _gps_quality(accuracy)
+            }]
+
+        rng = self._rng
+        steps = min(int(now - sim['timestamp']), MAX_FIXES_PER_BATCH)
+        fixes = []
+        for _ in range(steps):
+            # 向きを少しずつ変えながら歩行速度で移動
+            sim['timestamp'] += 1
+            sim['heading'] += rng.gauss(0, 0.2)
+            speed = rng.uniform(0.9, 1.5)  # m/s
+            sim['lat'] += speed * math.cos(sim['heading']) / M_PER_DEG_LAT
+            sim['lon'] += speed * math.sin(sim['heading']) / (M_PER_DEG_LAT * math.cos(math.radians(sim['lat'])))
+            fixes.append(_noisy_fix(rng, sim['lat'], sim['lon'], sim['timestamp'], sim['base_location']))
+
+        # 取り込みきれなかった分は読み飛ばす
+        sim['timestamp'] = max(sim['timestamp'], now - 1)
+        return fixes
+
+
+class RouteWalkerSource(LocationSource):
+    """[[lat, lon], ...] 形式のルートに沿って歩行速度で進む歩行者のシミュレーション
+
+    1秒ごとに 0.9〜1.5m 進み、測位誤差を加えた位置を返す。ルートの終点に
+    着いたら finished になる。
+    """
+
+    def __init__(self, coords, seed=None, base_location=''):
+        coords = np.asarray(coords, dtype=np.float64)
+        if len(coords) < 2:
+            raise ValueError('ルートには2点以上の座標が必要です')
+        self._lats = coords[:, 0]
+        self._lons = coords[:, 1]
+        self._cumulative_m = np.concatenate(([0.0], np.cumsum(segment_distances(self._lats, self._lons) * 1000)))
+        self._rng = random.Random(seed)
+        self._base_location = base_location
+        self._walked_m = 0.0
+        self._timestamp = None
+
+    @property
+    def length_m(self):
+        return float(self._cumulative_m[-1])
+
+    @property
+    def finished(self):
+        return self._walked_m >= self.length_m
+
+    def _position(self):
+        lat = float(np.interp(self._walked_m, self._cumulative_m, self._lats))
+        lon = float(np.interp(self._walked_m, self._cumulative_m, self._lons))
+        return lat, lon
+
+    def read(self, now):
+        if self._timestamp is None:
+            self._timestamp = now
+            lat, lon = self._position()
+            return [{
+                'lat': lat,
+                'lon': lon,
+                'accuracy': DEFAULT_ACCURACY,
+                'timestamp': now,
+                'base_location': self._base_location,
+                'gps_quality': _gps_quality(DEFAULT_ACCURACY)
+            }]
+
+        steps = min(int(now - self._timestamp), MAX_FIXES_PER_BATCH)
+        fixes = []
+        for _ in range(steps):
+            if self.finished:
+                break
+            self._timestamp += 1
+            self._walked_m = min(self.length_m, self._walked_m + self._rng.uniform(0.9, 1.5))
+            lat, lon = self._position()
+            fixes.append(_noisy_fix(self._rng, lat, lon, self._timestamp, self._base_location))
+
+        # 取り込みきれなかった分は読み飛ばす
+        self._timestamp = max(self._timestamp, now - 1)
+        return fixes
+
+
+class ReplaySource(LocationSource):
+    """記録した経路を speed 倍速で再生する
+
+    points は lat / lon / timestamp（と任意で accuracy）を持つ辞書の時刻順の
+    リスト。最初の取得時刻を記録の最初の点に合わせ、経過時間の speed 倍までに
+    記録された点を返す。測位の時刻は記録どうしの間隔を保つので、平滑化で
+    速度が不自然に見えることはない。
+    """
+
+    def __init__(self, points, speed=1.0, base_location=''):
+        if not points:
+            raise ValueError('再生する経路が空です')
+        if speed <= 0:
+            raise ValueError('再生速度は正の値にしてください')
+        self._points = points
+        self.speed = speed
+        self._base_location = base_location
+        self._next = 0
+        self._origin = None
+
+    @property
+    def finished(self):
+        return self._next >= len(self._points)
+
+    def read(self, now):
+        if self._origin is None:
+            self._origin = now
+        first_timestamp = self._points[0]['timestamp']
+        replayed_until = first_timestamp + (now - self._origin) * self.speed
+
+        fixes = []
+        while not self.finished and self._points[self._next]['timestamp'] <= replayed_until:
+            point = self._points[self._next]
+            accuracy = point.get('accuracy') or DEFAULT_ACCURACY
+            fixes.append({
+                'lat': point['lat'],
+                'lon': point['lon'],
+                'accuracy': accuracy,
+                'timestamp': self._origin + (point['timestamp'] - first_timestamp),
+                'base_location': self._base_location,
+                'gps_quality': _gps_quality(accuracy)
+            })
+            self._next += 1
+        return fixes
+
+
+def _parse_time(value):
+    """UNIX時刻の秒、または ISO 8601 形式の時刻を秒に変換"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.strip().replace('Z', '+00:00')).timestamp()
+
+
+def load_gpx(path):
+    """GPX の trkpt を時刻順の測位のリストで読み込む（時刻がない点は1秒間隔とみなす）"""
+    points = []
+    for _, element in ET.iterparse(path):
+        if element.tag.rsplit('}', 1)[-1] != 'trkpt':
+            continue
+        time_text = next((child.text for child in element if child.tag.rsplit('}', 1)[-1] == 'time'), None)
+        points.append({
+            'lat': float(element.get('lat')),
+            'lon': float(element.get('lon')),
+            'timestamp': _parse_time(time_text) if time_text else (points[-1]['timestamp'] + 1 if points else 0.0)
+        })
+        element.clear()
+    return points
+
+
+def load_csv(path):
+    """lat, lon, timestamp（UNIX時刻の秒か ISO 8601）、任意で accuracy 列を持つCSVを読み込む"""
+    points = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                point = {
+                    'lat': float(row['lat']),
+                    'lon': float(row['lon']),
+                    'timestamp': _parse_time(row['timestamp'])
+                }
+                if row.get('accuracy'):
+                    point['accuracy'] = float(row['accuracy'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            points.append(point)
+    points.sort(key=lambda point: point['timestamp'])
+    return points
+
+
+def load_track(path):
+    """拡張子に応じて GPX / CSV の経路を読み込む"""
+    if path.lower().endswith('.gpx'):
+        return load_gpx(path)
+    return load_csv(path)
+
+
+def create_location_source(route=None, kind=None, seed=None):
+    """設定（WALK_LOCATION_SOURCE など）に応じた測位の取得元を作成
+
+    kind を省略すると LOCATION_SOURCE を使う。route は route 方式のときに
+    歩くルート（coordinates を持つ辞書）。
+    """
+    kind = kind or LOCATION_SOURCE
+    if kind == 'random':
+        return RandomWalkSource(seed=seed)
+    if kind == 'replay':
+        if not REPLAY_FILE:
+            raise ValueError('WALK_REPLAY_FILE に再生する経路のファイルを指定してください')
+        return ReplaySource(load_track(REPLAY_FILE), REPLAY_SPEED)
+    if kind == 'route':
+        if not route or not route.get('coordinates'):
+            raise ValueError('route 方式には座標を持つルートが必要です')
+        return RouteWalkerSource(route['coordinates'], seed=seed,
+                                 base_location=route.get('area_info', {}).get('district', ''))
+    raise ValueError(f'不明な測位の取得元: {kind}')
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """件数上限付きLRUキャッシュ（任意でTTLによる期限切れあり、スレッドセーフ）
+
+    ヒット・ミス・追い出し件数を数えており、stats() で実トラフィックでの
+    サイズ調整に使える。on_evict を渡すと、件数上限で追い出したエントリを
+    (key, value) で受け取れる（ディスクへの退避などに使う）。
+    """
+
+    def __init__(self, maxsize=10000, ttl=None, clock=time.monotonic, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """キーの値を取得（なし・期限切れの場合は default）"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """キーに値を保存し、上限を超えた分を古い順に追い出す"""
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted_key, (evicted_value, _) = self._data.popitem(last=False)
+                evicted.append((evicted_key, evicted_value))
+                self.evictions += 1
+
+        # 退避処理は遅いことがあるのでロックの外で呼ぶ
+        if self._on_evict is not None:
+            for evicted_key, evicted_value in evicted:
+                self._on_evict(evicted_key, evicted_value)
+
+    def get_or_compute(self, key, compute):
+        """キャッシュになければ compute() で計算して保存"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            # 計算中はロックを保持しない（同時ミス時の二重計算は許容）
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """全エントリを削除"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """ヒット・ミス件数などの統計情報"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
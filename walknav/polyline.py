@@ -0,0 +1,156 @@
+"""経路の折れ線の簡略化と符号化
+
+地図に描く経路（散歩の軌跡・予定ルート）の点を Douglas–Peucker 法で減らす。
+許容誤差は地図のズームレベルの1ピクセルぶんの距離を基準にし、それでも
+頂点数が上限を超える場合は、形への影響が大きい点から順に上限数だけ残す。
+どちらも各区間の点をまとめて numpy で計算する。
+
+送受信・保存用に Google の Encoded Polyline 形式への符号化・復号もできる。
+
+    coords = simplify_for_zoom(track.lats, track.lons, zoom=16, max_vertices=1000)
+    text = encode(coords)   # '_p~iF~ps|U_ulLnnqC...'
+"""
+import heapq
+import math
+
+import numpy as np
+
+from .geo_distance import EARTH_RADIUS_KM
+
+# ズーム0・赤道での1ピクセルあたりの距離（m、Webメルカトルの256pxタイル）
+_METERS_PER_PIXEL_Z0 = 2 * math.pi * EARTH_RADIUS_KM * 1000 / 256
+
+
+def meters_per_pixel(zoom, lat):
+    """ズームレベル・緯度での地図1ピクセルあたりの距離（m）"""
+    return _METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+def _project(lats, lons):
+    """経路の中心を原点とした平面座標（m、正距円筒図法）"""
+    lat0 = math.radians(float(lats.mean()))
+    scale = math.radians(1) * EARTH_RADIUS_KM * 1000
+    x = (lons - lons.mean()) * scale * math.cos(lat0)
+    y = (lats - lats.mean()) * scale
+    return x, y
+
+
+def _segment_distances(x, y, x1, y1, x2, y2):
+    """点列から線分 (x1, y1)-(x2, y2) までの距離（m）"""
+    dx = x2 - x1
+    dy = y2 - y1
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0.0:
+        # 周回ルートの始点と終点など、線分が点になっている場合
+        return np.hypot(x - x1, y - y1)
+    t = np.clip(((x - x1) * dx + (y - y1) * dy) / length_sq, 0.0, 1.0)
+    return np.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+
+def _split(x, y, start, end, parent_error):
+    """区間の内側で元の折れ線から最も離れた点と、その点を残すと減る誤差（m）
+
+    誤差は親の区間の誤差以下に揃えるので、誤差の大きい順に点を残していくと
+    Douglas–Peucker 法で許容誤差を小さくしていった途中の形と同じになる。
+    """
+    distances = _segment_distances(x[start + 1:end], y[start + 1:end],
+                                   x[start], y[start], x[end], y[end])
+    offset = int(np.argmax(distances))
+    return start + 1 + offset, min(float(distances[offset]), parent_error)
+
+
+def simplify_indices(lats, lons, tolerance_m, max_vertices=None):
+    """簡略化した折れ線に残す点の番号（昇順の配列）
+
+    元の折れ線からのずれが tolerance_m 以内になるように点を減らす。
+    max_vertices を指定した場合は、誤差の大きい点から順に残していき、
+    max_vertices 点（2点以上）に達したらそこで打ち切る。
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    size = len(lats)
+    if size <= 2:
+        return np.arange(size)
+
+    x, y = _project(lats, lons)
+    limit = size if max_vertices is None else max(2, max_vertices)
+    kept = [0, size - 1]
+    heap = []  # (-誤差, 区間の始点, 終点, 分割する点)
+
+    def push(start, end, parent_error):
+        if end - start >= 2:
+            index, error = _split(x, y, start, end, parent_error)
+            heapq.heappush(heap, (-error, start, end, index))
+
+    push(0, size - 1, math.inf)
+    while heap and len(kept) < limit:
+        negative_error, start, end, index = heapq.heappop(heap)
+        if -negative_error < tolerance_m:
+            break
+        kept.append(index)
+        push(start, index, -negative_error)
+        push(index, end, -negative_error)
+    return np.sort(np.array(kept, dtype=np.intp))
+
+
+def simplify(coords, tolerance_m, max_vertices=None):
+    """[[lat, lon], ...] 形式の経路を簡略化した座標リスト"""
+    if len(coords) <= 2:
+        return [list(point) for point in coords]
+    arr = np.asarray(coords, dtype=np.float64)
+    return arr[simplify_indices(arr[:, 0], arr[:, 1], tolerance_m, max_vertices)].tolist()
+
+
+def simplify_for_zoom(lats, lons, zoom, max_vertices=None, pixels=1.0):
+    """ズームレベルに合わせて簡略化した [[lat, lon], ...] 形式の座標リスト
+
+    地図上で pixels ピクセル未満のずれは見分けられないので、その距離を
+    許容誤差にする（ズームアウトするほど点が減る）。
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if len(lats) == 0:
+        return []
+    tolerance_m = pixels * meters_per_pixel(zoom, float(lats.mean()))
+    kept = simplify_indices(lats, lons, tolerance_m, max_vertices)
+    return np.column_stack((lats[kept], lons[kept])).tolist()
+
+
+def encode(coords, precision=5):
+    """[[lat, lon], ...] 形式の経路を Encoded Polyline 形式の文字列に符号化"""
+    if len(coords) == 0:
+        return ''
+    values = np.round(np.asarray(coords, dtype=np.float64) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=0).ravel()
+    zigzag = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # 各値を下位から5ビットずつに分け、続きがある塊には 0x20 を立てる
+    shifts = 5 * np.arange(max(1, -(-int(zigzag.max()).bit_length() // 5)))
+    chunks = (zigzag[:, None] >> shifts) & 0x1F
+    used = (zigzag[:, None] >> shifts) > 0
+    used[:, 0] = True
+    more = np.zeros_like(used)
+    more[:, :-1] = used[:, 1:]
+    chunks = chunks | np.where(more, 0x20, 0)
+    return (chunks[used] + 63).astype(np.uint8).tobytes().decode('ascii')
+
+
+def decode(text, precision=5):
+    """Encoded Polyline 形式の文字列を [[lat, lon], ...] 形式の座標リストに復号"""
+    if not text:
+        return []
+    chunks = np.frombuffer(text.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    ends = chunks < 0x20
+    if not ends[-1] or np.count_nonzero(ends) % 2:
+        raise ValueError('Encoded Polyline 形式の文字列が途中で終わっています')
+
+    # 塊ごとに、属する値の番号と値の中での位置を求めて組み立てる
+    value_ids = np.concatenate(([0], np.cumsum(ends)[:-1]))
+    starts = np.concatenate(([0], np.flatnonzero(ends)[:-1] + 1))
+    positions = np.arange(len(chunks)) - starts[value_ids]
+    zigzag = np.zeros(int(value_ids[-1]) + 1, dtype=np.int64)
+    np.add.at(zigzag, value_ids, (chunks & 0x1F) << (5 * positions))
+
+    deltas = np.where(zigzag & 1, ~(zigzag >> 1), zigzag >> 1)
+    values = np.cumsum(deltas.reshape(-1, 2), axis=0)
+    return (values / 10 ** precision).tolist()
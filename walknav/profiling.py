@@ -0,0 +1,212 @@
+"""再実行ごとの処理時間の計測
+
+WALK_PROFILE=1 のときだけ有効になる。関数には @profiled を、関数の一部には
+with timed(...) を付けておくと、所要時間を名前ごとのリングバッファに記録し、
+p50 / p95 / p99 を Prometheus のテキスト形式で書き出せる。
+
+    WALK_PROFILE=1 WALK_PROFILE_FILE=walk_metrics.prom streamlit run app.py
+    WALK_PROFILE=1 WALK_PROFILE_PORT=9108 streamlit run app.py   # http://localhost:9108/metrics
+
+rerun_scope() の中（Streamlit のスクリプト実行スレッド）では、同じ名前の
+呼び出しを1回の再実行ぶん合計してから1件として記録する。スコープの外
+（ワーカースレッドなど）では呼び出しごとに記録する。無効のときは @profiled は
+関数をそのまま返し、timed() / rerun_scope() は何もしないコンテキストを返す。
+"""
+import contextlib
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+PROFILE_ENABLED = os.environ.get('WALK_PROFILE', '').lower() in ('1', 'true', 'yes')
+PROFILE_SAMPLES = int(os.environ.get('WALK_PROFILE_SAMPLES', 1024))  # 名前ごとに保持する件数
+PROFILE_FILE = os.environ.get('WALK_PROFILE_FILE')
+PROFILE_PORT = int(os.environ.get('WALK_PROFILE_PORT', 0))
+PROFILE_WRITE_INTERVAL = 5.0  # 秒（ファイルへの書き出し間隔）
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    """名前ごとの所要時間（秒）のリングバッファ"""
+
+    def __init__(self, samples=1024):
+        self.samples = samples
+        self._timings = {}
+        self._totals = {}  # 名前 -> (件数, 合計秒)。リングバッファから消えた分も含む
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record(self, name, seconds):
+        """所要時間を記録（再実行のスコープ内なら再実行ごとの合計に加える）"""
+        scope = getattr(self._local, 'scope', None)
+        if scope is not None:
+            scope[name] = scope.get(name, 0.0) + seconds
+            return
+        self._store(name, seconds)
+
+    def _store(self, name, seconds):
+        with self._lock:
+            timings = self._timings.get(name)
+            if timings is None:
+                timings = self._timings[name] = deque(maxlen=self.samples)
+            timings.append(seconds)
+            count, total = self._totals.get(name, (0, 0.0))
+            self._totals[name] = (count + 1, total + seconds)
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def rerun_scope(self, name='rerun'):
+        """1回の再実行を計測し、中で計測した処理を再実行ごとの合計として記録"""
+        if getattr(self._local, 'scope', None) is not None:
+            # 入れ子のスコープは外側にまとめる
+            yield
+            return
+        scope = self._local.scope = {}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._local.scope = None
+            for scoped_name, seconds in scope.items():
+                self._store(scoped_name, seconds)
+            self._store(name, elapsed)
+
+    def summary(self):
+        """名前ごとの件数・合計と、直近の記録の p50 / p95 / p99（秒）"""
+        with self._lock:
+            snapshot = {name: sorted(timings) for name, timings in self._timings.items()}
+            totals = dict(self._totals)
+
+        result = {}
+        for name, timings in sorted(snapshot.items()):
+            count, total = totals[name]
+            result[name] = {
+                'count': count,
+                'sum': total,
+                'quantiles': {q: timings[min(len(timings) - 1, int(q * len(timings)))] for q in QUANTILES}
+            }
+        return result
+
+    def prometheus_text(self):
+        """Prometheus のテキスト形式（summary 型）"""
+        lines = [
+            '# HELP walknav_duration_seconds Time spent per rerun (or per call outside a rerun).',
+            '# TYPE walknav_duration_seconds summary'
+        ]
+        for name, stats in self.summary().items():
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            for q, value in stats['quantiles'].items():
+                lines.append(f'walknav_duration_seconds{{name="{label}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'walknav_duration_seconds_sum{{name="{label}"}} {stats["sum"]:.6f}')
+            lines.append(f'walknav_duration_seconds_count{{name="{label}"}} {stats["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """テキスト形式で書き出す（書きかけを読まれないよう置き換えで保存）"""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+PROFILER = Profiler(PROFILE_SAMPLES) if PROFILE_ENABLED else None
+_last_write = 0.0
+_write_lock = threading.Lock()
+_server = None
+
+
+def profiled(name=None):
+    """関数の所要時間を記録するデコレーター（無効のときは関数をそのまま返す）"""
+    def decorate(func):
+        if PROFILER is None:
+            return func
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                PROFILER.record(label, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def timed(name):
+    """with 文の中の所要時間を記録（無効のときは何もしない）"""
+    return _NULL_CONTEXT if PROFILER is None else PROFILER.timed(name)
+
+
+def rerun_scope(name='rerun'):
+    """1回の再実行を囲むコンテキスト（無効のときは何もしない）"""
+    return _NULL_CONTEXT if PROFILER is None else PROFILER.rerun_scope(name)
+
+
+def export_metrics(force=False):
+    """設定に応じてメトリクスを書き出し、エンドポイントを起動する
+
+    ファイルへの書き出しは PROFILE_WRITE_INTERVAL 秒に1回まで。
+    """
+    global _last_write
+    if PROFILER is None:
+        return
+    if PROFILE_PORT:
+        start_metrics_server(PROFILE_PORT)
+    if PROFILE_FILE:
+        now = time.monotonic()
+        with _write_lock:
+            if not force and now - _last_write < PROFILE_WRITE_INTERVAL:
+                return
+            _last_write = now
+        PROFILER.write(PROFILE_FILE)
+
+
+def start_metrics_server(port):
+    """/metrics を返すHTTPサーバーをバックグラウンドで起動（プロセス内で1回だけ試みる）"""
+    global _server
+    with _write_lock:
+        if _server is not None:
+            return _server or None
+
+        # 有効なときしか使わないので、ここで読み込む
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = PROFILER.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            _server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        except OSError:
+            logger.warning('メトリクスのエンドポイントを起動できません（ポート %d）', port, exc_info=True)
+            _server = False
+            return None
+    threading.Thread(target=_server.serve_forever, name='walk-metrics', daemon=True).start()
+    return _server
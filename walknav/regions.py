@@ -0,0 +1,169 @@
+import json
+import math
+import os
+
+import numpy as np
+
+
+def _ring_edges(ring):
+    """リング座標 [[lon, lat], ...] から辺の配列 (x1, y1, x2, y2) を作成"""
+    pts = np.asarray(ring, dtype=np.float64)[:, :2]
+    if len(pts) < 3:
+        return np.empty((0, 4), dtype=np.float64)
+    nxt = np.roll(pts, -1, axis=0)
+    return np.hstack([pts, nxt])
+
+
+def _ring_area(ring):
+    """リングの面積（度単位、符号なし）"""
+    pts = np.asarray(ring, dtype=np.float64)[:, :2]
+    x, y = pts[:, 0], pts[:, 1]
+    return abs(float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))) / 2
+
+
+def points_in_polygon(lats, lons, edges):
+    """複数点の内外判定を一括で行う（偶奇規則のレイキャスト法）
+
+    edges は全リング（穴・マルチポリゴンの各部分を含む）の辺を連結した配列。
+    """
+    px = np.asarray(lons, dtype=np.float64)[:, None]
+    py = np.asarray(lats, dtype=np.float64)[:, None]
+    x1, y1, x2, y2 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+
+    crosses = (y1 > py) != (y2 > py)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_at = (x2 - x1) * (py - y1) / (y2 - y1) + x1
+    hits = crosses & (px < x_at)
+    return (hits.sum(axis=1) % 2) == 1
+
+
+class RegionIndex:
+    """行政区ポリゴンの空間インデックス
+
+    各ポリゴンの外接矩形が掛かるグリッドセルにポリゴン番号を登録しておき、
+    点が属するセルの候補ポリゴンだけを内外判定する。候補が重なる場合は
+    面積の小さい（より詳細な）ポリゴンを優先する。
+    """
+
+    def __init__(self, regions, cell_deg=0.01):
+        self.cell_deg = cell_deg
+        self.regions = []
+        self._edges = []
+        areas = []
+
+        for region in regions:
+            polygons = region['polygons']
+            edges = [_ring_edges(ring) for polygon in polygons for ring in polygon]
+            edges = np.vstack(edges) if edges else np.empty((0, 4))
+            if len(edges) == 0:
+                continue
+            self.regions.append(region['properties'])
+            self._edges.append(edges)
+            # 各ポリゴンの外周リングの面積からそのポリゴンの穴の面積を引いたものの合計
+            areas.append(sum(_ring_area(polygon[0]) - sum(_ring_area(ring) for ring in polygon[1:])
+                             for polygon in polygons if polygon))
+
+        self._areas = np.array(areas, dtype=np.float64)
+
+        # セル番号 -> ポリゴン番号のリスト（面積の小さい順）
+        self._cells = {}
+        for region_id in np.argsort(self._areas, kind='stable'):
+            edges = self._edges[region_id]
+            xs = np.concatenate([edges[:, 0], edges[:, 2]])
+            ys = np.concatenate([edges[:, 1], edges[:, 3]])
+            row_min, row_max = self._row(ys.min()), self._row(ys.max())
+            col_min, col_max = self._col(xs.min()), self._col(xs.max())
+            for row in range(row_min, row_max + 1):
+                for col in range(col_min, col_max + 1):
+                    self._cells.setdefault((row, col), []).append(int(region_id))
+
+    def __len__(self):
+        return len(self.regions)
+
+    def _row(self, lat):
+        return int(math.floor(lat / self.cell_deg))
+
+    def _col(self, lon):
+        return int(math.floor(lon / self.cell_deg))
+
+    def lookup(self, lat, lon):
+        """座標を含む地域の属性を取得（該当なしはNone）"""
+        region_id = self.lookup_ids([lat], [lon])[0]
+        return self.regions[region_id] if region_id >= 0 else None
+
+    def lookup_ids(self, lats, lons):
+        """複数座標の地域番号を一括で取得（該当なしは-1）
+
+        歩いた経路全体などを1回で解決するためのバッチAPI。
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = np.full(len(lats), -1, dtype=np.int32)
+        if len(lats) == 0 or not self._cells:
+            return result
+
+        rows = np.floor(lats / self.cell_deg).astype(np.int64)
+        cols = np.floor(lons / self.cell_deg).astype(np.int64)
+        cell_keys = np.stack([rows, cols], axis=1)
+        unique_cells, inverse = np.unique(cell_keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        # セルごとに候補ポリゴンを面積の小さい順に判定し、未確定の点だけを次へ回す
+        for cell_no, (row, col) in enumerate(unique_cells):
+            candidates = self._cells.get((int(row), int(col)))
+            if not candidates:
+                continue
+            point_ids = np.nonzero(inverse == cell_no)[0]
+            for region_id in candidates:
+                inside = points_in_polygon(lats[point_ids], lons[point_ids], self._edges[region_id])
+                result[point_ids[inside]] = region_id
+                point_ids = point_ids[~inside]
+                if len(point_ids) == 0:
+                    break
+
+        return result
+
+    def lookup_many(self, lats, lons):
+        """複数座標の地域属性を一括で取得（該当なしはNone）"""
+        return [self.regions[i] if i >= 0 else None for i in self.lookup_ids(lats, lons)]
+
+
+def load_regions_geojson(path):
+    """GeoJSON（Polygon / MultiPolygon）から地域ポリゴンを読み込む
+
+    地域ごとに、ポリゴン（外周リングと穴のリングのリスト）のリストを持つ。
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    regions = []
+    for feature in data.get('features', []):
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            continue
+        regions.append({'properties': feature.get('properties') or {}, 'polygons': polygons})
+    return regions
+
+
+def zones_to_regions(zones):
+    """(最小緯度, 最大緯度, 最小経度, 最大経度) の矩形を地域ポリゴンに変換"""
+    regions = []
+    for (min_lat, max_lat, min_lon, max_lon), properties in zones:
+        ring = [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat],
+                [min_lon, max_lat], [min_lon, min_lat]]
+        regions.append({'properties': properties, 'polygons': [[ring]]})
+    return regions
+
+
+def build_region_index(default_zones, dataset_path=None, cell_deg=0.01):
+    """GeoJSONがあれば読み込み、なければ既定の矩形データで地域インデックスを構築"""
+    regions = None
+    if dataset_path and os.path.exists(dataset_path):
+        regions = load_regions_geojson(dataset_path)
+    if not regions:
+        regions = zones_to_regions(default_zones)
+    return RegionIndex(regions, cell_deg=cell_deg)
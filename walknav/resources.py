@@ -0,0 +1,314 @@
+"""全セッションで共有するデータとリソース
+
+データセットの場所は WALK_* 環境変数で指定し、ファイルがなければ組み込みの
+既定値で動く（またはNoneを返して呼び出し側が簡易計算に切り替える）。
+各リソースはプロセス内で初回の取得時に1回だけ作られる。データセットを読む
+モジュールもそのときに読み込むので、パッケージの読み込み自体は軽い。
+"""
+import functools
+import os
+import threading
+
+
+def shared_resource(func):
+    """引数ごとに1回だけ作ってプロセス内で共有する（同時に呼ばれても作成は1回）"""
+    cache = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        if args not in cache:
+            with lock:
+                if args not in cache:
+                    cache[args] = func(*args)
+        return cache[args]
+
+    wrapper.clear = cache.clear
+    return wrapper
+
+
+# バックグラウンド処理のスレッド数
+WORKER_POOL_SIZE = int(os.environ.get('WALK_WORKER_POOL_SIZE', 8))
+
+# 散歩記録の保存先
+HISTORY_DB_PATH = os.environ.get('WALK_HISTORY_DB', 'walk_history.db')
+
+
+@shared_resource
+def get_history_store():
+    """散歩記録のデータベースを取得（全セッションで共有）"""
+    from .history_store import WalkHistoryStore
+    return WalkHistoryStore(HISTORY_DB_PATH)
+
+
+# 主要駅のデータ（全国データセットがない場合の既定値）
+STATIONS = [
+    {'name': '川崎駅', 'lat': 35.5308, 'lon': 139.7029},
+    {'name': '新宿駅', 'lat': 35.6896, 'lon': 139.7006},
+    {'name': '渋谷駅', 'lat': 35.6580, 'lon': 139.7016},
+    {'name': '横浜駅', 'lat': 35.4657, 'lon': 139.6220},
+    {'name': '品川駅', 'lat': 35.6289, 'lon': 139.7390},
+    {'name': '東京駅', 'lat': 35.6812, 'lon': 139.7671},
+    {'name': '大阪駅', 'lat': 34.7024, 'lon': 135.4959},
+    {'name': '京都駅', 'lat': 34.9859, 'lon': 135.7581},
+    {'name': '武蔵小杉駅', 'lat': 35.5777, 'lon': 139.6565},
+    {'name': '溝の口駅', 'lat': 35.6017, 'lon': 139.6106}
+]
+
+# 主要ランドマークのデータ（全国データセットがない場合の既定値）
+LANDMARKS = [
+    {'name': 'ラゾーナ川崎', 'lat': 35.5308, 'lon': 139.7029},
+    {'name': '川崎大師', 'lat': 35.5344, 'lon': 139.7394},
+    {'name': '多摩川', 'lat': 35.5500, 'lon': 139.6500},
+    {'name': '等々力競技場', 'lat': 35.5647, 'lon': 139.6567},
+    {'name': '新宿御苑', 'lat': 35.6851, 'lon': 139.7101},
+    {'name': '代々木公園', 'lat': 35.6719, 'lon': 139.6968},
+    {'name': '皇居', 'lat': 35.6852, 'lon': 139.7528},
+    {'name': '東京タワー', 'lat': 35.6586, 'lon': 139.7454},
+    {'name': '横浜中華街', 'lat': 35.4426, 'lon': 139.6496}
+]
+
+# 全国の駅・POIデータセット（name, lat, lon 列のCSV）
+STATION_DATASET_PATH = os.environ.get('WALK_STATION_DATASET', 'data/stations.csv')
+LANDMARK_DATASET_PATH = os.environ.get('WALK_LANDMARK_DATASET', 'data/landmarks.csv')
+
+
+@shared_resource
+def get_station_index():
+    """駅の空間インデックスを取得（プロセス内で1回だけ構築し全セッションで共有）"""
+    from .spatial_index import build_index
+    return build_index(STATIONS, STATION_DATASET_PATH)
+
+
+@shared_resource
+def get_landmark_index():
+    """ランドマークの空間インデックスを取得（プロセス内で1回だけ構築し全セッションで共有）"""
+    from .spatial_index import build_index
+    return build_index(LANDMARKS, LANDMARK_DATASET_PATH)
+
+
+# 日本の主要都市の地域データ（行政区ポリゴンがない場合の既定値）
+CITY_ZONES = [
+    # 東京23区
+    ((35.6580, 35.7320, 139.6910, 139.7910), {
+        'prefecture': '東京都',
+        'city': '新宿区',
+        'area_type': '商業・オフィス街',
+        'population_density': 'very_high'
+    }),
+    ((35.6390, 35.6890, 139.6910, 139.7910), {
+        'prefecture': '東京都',
+        'city': '渋谷区',
+        'area_type': '商業・エンタメ街',
+        'population_density': 'very_high'
+    }),
+    ((35.6490, 35.6990, 139.7210, 139.7910), {
+        'prefecture': '東京都',
+        'city': '中央区',
+        'area_type': 'ビジネス街',
+        'population_density': 'high'
+    }),
+
+    # 川崎市
+    ((35.5100, 35.5700, 139.6700, 139.7400), {
+        'prefecture': '神奈川県',
+        'city': '川崎市川崎区',
+        'area_type': '工業・住宅地',
+        'population_density': 'high'
+    }),
+    ((35.5500, 35.6000, 139.6500, 139.7200), {
+        'prefecture': '神奈川県',
+        'city': '川崎市幸区',
+        'area_type': '住宅・商業地',
+        'population_density': 'high'
+    }),
+    ((35.5600, 35.6100, 139.6200, 139.6900), {
+        'prefecture': '神奈川県',
+        'city': '川崎市中原区',
+        'area_type': '住宅地',
+        'population_density': 'medium'
+    }),
+
+    # 横浜市
+    ((35.4400, 35.4900, 139.6200, 139.6700), {
+        'prefecture': '神奈川県',
+        'city': '横浜市西区',
+        'area_type': '商業・オフィス街',
+        'population_density': 'high'
+    }),
+    ((35.4300, 35.4800, 139.6000, 139.6500), {
+        'prefecture': '神奈川県',
+        'city': '横浜市中区',
+        'area_type': '観光・商業地',
+        'population_density': 'medium'
+    }),
+
+    # 大阪市
+    ((34.6700, 34.7200, 135.4900, 135.5400), {
+        'prefecture': '大阪府',
+        'city': '大阪市北区',
+        'area_type': '商業・オフィス街',
+        'population_density': 'very_high'
+    }),
+    ((34.6600, 34.7100, 135.4800, 135.5300), {
+        'prefecture': '大阪府',
+        'city': '大阪市中央区',
+        'area_type': 'ビジネス街',
+        'population_density': 'high'
+    }),
+
+    # 京都市
+    ((35.0000, 35.0500, 135.7500, 135.8000), {
+        'prefecture': '京都府',
+        'city': '京都市下京区',
+        'area_type': '観光・商業地',
+        'population_density': 'medium'
+    }),
+    ((35.0100, 35.0600, 135.7600, 135.8100), {
+        'prefecture': '京都府',
+        'city': '京都市中京区',
+        'area_type': '住宅・商業地',
+        'population_density': 'medium'
+    })
+]
+
+# 行政区ポリゴン（prefecture, city, area_type, population_density 属性を持つGeoJSON）
+WARD_DATASET_PATH = os.environ.get('WALK_WARD_DATASET', 'data/wards.geojson')
+
+
+@shared_resource
+def get_region_index():
+    """地域ポリゴンのインデックスを取得（プロセス内で1回だけ構築し全セッションで共有）"""
+    from .regions import build_region_index
+    return build_region_index(CITY_ZONES, WARD_DATASET_PATH)
+
+
+# 歩行者道路ネットワーク（python -m walknav.street_graph でOSM抽出データから作成した .npz）
+STREET_GRAPH_PATH = os.environ.get('WALK_STREET_GRAPH', 'data/street_graph.npz')
+
+
+@shared_resource
+def get_street_graph():
+    """歩行者道路グラフを取得（データがなければNone、全セッションで共有）"""
+    if not os.path.exists(STREET_GRAPH_PATH):
+        return None
+    from .street_graph import StreetGraph
+    return StreetGraph.load(STREET_GRAPH_PATH)
+
+
+# 標高グリッド（python -m walknav.elevation で国土地理院の標高タイルから作成）
+ELEVATION_GRID_PATH = os.environ.get('WALK_ELEVATION_GRID', 'data/elevation.dem')
+
+
+@shared_resource
+def get_elevation_grid():
+    """標高グリッドを取得（データがなければNone、メモリマップで全セッション共有）"""
+    if not os.path.exists(ELEVATION_GRID_PATH):
+        return None
+    from .elevation import ElevationGrid
+    return ElevationGrid(ELEVATION_GRID_PATH)
+
+
+# 安全度・歩きやすさのラスター（python -m walknav.score_raster で街灯・歩道・犯罪統計から作成）
+SCORE_RASTER_PATH = os.environ.get('WALK_SCORE_RASTER', 'data/scores.raster')
+
+
+@shared_resource
+def get_score_raster():
+    """安全度・歩きやすさのラスターを取得（データがなければNone、全セッション共有）"""
+    if not os.path.exists(SCORE_RASTER_PATH):
+        return None
+    from .score_raster import ScoreRaster
+    return ScoreRaster(SCORE_RASTER_PATH)
+
+
+# ルート沿いの施設（name, type, lat, lon 列のCSV）
+FACILITY_DATASET_PATH = os.environ.get('WALK_FACILITY_DATASET', 'data/facilities.csv')
+
+
+@shared_resource
+def get_facility_index():
+    """施設の空間インデックスを取得（データがなければNone、全セッション共有）"""
+    if not os.path.exists(FACILITY_DATASET_PATH):
+        return None
+    from .facilities import FacilityIndex
+    return FacilityIndex.from_csv(FACILITY_DATASET_PATH)
+
+
+# 縮約階層（python -m walknav.contraction で道路グラフから事前に作成）
+STREET_HIERARCHY_PATH = os.environ.get('WALK_STREET_HIERARCHY', 'data/street_graph_ch')
+
+
+@shared_resource
+def get_street_hierarchy(preset=None):
+    """道路グラフの縮約階層を取得（preset 指定時はそのプリセットの辺コストで作ったもの）
+
+    データがなければNone。メモリマップで全セッション共有。
+    """
+    street_graph = get_street_graph()
+    path = STREET_HIERARCHY_PATH if preset is None else os.path.join(STREET_HIERARCHY_PATH, preset)
+    if street_graph is None or not os.path.isdir(path):
+        return None
+    from .contraction import ContractionHierarchy
+    hierarchy = ContractionHierarchy.load(path)
+    # 別のグラフから作った縮約階層は使わない
+    if len(hierarchy.rank) != street_graph.node_count:
+        return None
+    return hierarchy
+
+
+@shared_resource
+def get_edge_cost_table():
+    """安全重視度・歩行ペースのプリセットごとの辺コスト（道路グラフとラスターがなければNone）"""
+    street_graph = get_street_graph()
+    score_raster = get_score_raster()
+    if street_graph is None or score_raster is None:
+        return None
+    from .edge_costs import EdgeCostTable
+    return EdgeCostTable(street_graph, score_raster)
+
+
+# 位置詳細キャッシュの設定（ジオハッシュ精度7 = 約150m四方を同一地点として扱う）
+LOCATION_CACHE_PRECISION = 7
+LOCATION_CACHE_SIZE = int(os.environ.get('WALK_LOCATION_CACHE_SIZE', 20000))
+LOCATION_CACHE_TTL = float(os.environ.get('WALK_LOCATION_CACHE_TTL', 600))
+
+
+@shared_resource
+def get_location_cache():
+    """位置詳細のキャッシュを取得（全セッションで共有）"""
+    from .lru_cache import LRUCache
+    return LRUCache(maxsize=LOCATION_CACHE_SIZE, ttl=LOCATION_CACHE_TTL)
+
+
+# 生成済みルートのキャッシュ設定（同じセル・同じ設定の要求はセッションをまたいで使い回す）
+ROUTE_CACHE_SIZE = int(os.environ.get('WALK_ROUTE_CACHE_SIZE', 2000))
+ROUTE_CACHE_TTL = float(os.environ.get('WALK_ROUTE_CACHE_TTL', 1800))
+ROUTE_CACHE_SPILL_DIR = os.environ.get('WALK_ROUTE_CACHE_DIR')  # 指定時のみディスクに退避
+
+
+@shared_resource
+def get_route_cache():
+    """生成済みルートのキャッシュを取得（全セッションで共有）"""
+    from .route_cache import RouteCache
+    return RouteCache(maxsize=ROUTE_CACHE_SIZE, precision=LOCATION_CACHE_PRECISION,
+                      ttl=ROUTE_CACHE_TTL, spill_dir=ROUTE_CACHE_SPILL_DIR)
+
+
+# ルート候補を生成するプロセス数
+ROUTE_CANDIDATE_PROCESSES = int(os.environ.get('WALK_ROUTE_PROCESSES', os.cpu_count() or 1))
+
+
+@shared_resource
+def get_route_candidate_pool():
+    """ルート候補生成用のプロセスプールを取得（全セッションで共有）
+
+    候補の生成は Python で回す経路探索が中心で GIL を離さないため、スレッドでは
+    並列にならないのでプロセスに分ける。サーバーのプロセスは多数のスレッドを
+    持つので fork ではなく spawn で起動する（乱数の状態もプロセスごとに別になる）。
+    各プロセスのデータセットは初回の候補生成時に読み込まれる。
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=ROUTE_CANDIDATE_PROCESSES,
+                               mp_context=multiprocessing.get_context('spawn'))
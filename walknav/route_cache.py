@@ -0,0 +1,131 @@
+import copy
+import hashlib
+import json
+import os
+import time
+
+from . import geohash
+from .lru_cache import LRUCache
+
+
+def preference_key(preferences):
+    """ルート生成に影響する設定を比較できる形にそろえる（興味の順序は区別しない）"""
+    return (
+        preferences.get('mobility', 'normal'),
+        int(preferences.get('walking_time', 30)),
+        tuple(sorted(preferences.get('interests', []))),
+        preferences.get('safety_level', 'high')
+    )
+
+
+def reanchor_routes(routes, origin, lat, lon):
+    """origin を出発点として作ったルートを (lat, lon) 出発に合わせたコピーを返す
+
+    道路に沿ったルート（on_streets）は道路上の点を動かさず、現在地とルートを結ぶ
+    最初と最後の点だけを (lat, lon) に置き換える。形だけの簡易ルートは全体を
+    平行移動する。
+    """
+    dlat = lat - origin[0]
+    dlon = lon - origin[1]
+    moved = copy.deepcopy(routes)
+    for route in moved:
+        coords = route['coordinates']
+        if route.get('on_streets') and len(coords) >= 2:
+            coords[0] = [lat, lon]
+            coords[-1] = [lat, lon]
+        else:
+            route['coordinates'] = [[p[0] + dlat, p[1] + dlon] for p in coords]
+    return moved
+
+
+class RouteCache:
+    """全セッションで共有する生成済みルートのキャッシュ
+
+    出発地点のジオハッシュセルと設定の組をキーにし、セル内の別の地点から
+    要求されたときはルートを要求地点に合わせて返す（reanchor_routes）。spill_dir を
+    指定すると、件数上限で追い出したエントリをJSONで退避し、次に同じキーが
+    要求されたときに読み戻す。
+    """
+
+    def __init__(self, maxsize=2000, precision=7, ttl=None, spill_dir=None):
+        self.precision = precision
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self.spill_writes = 0
+        self.spill_reads = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl,
+                               on_evict=self._spill if spill_dir else None)
+
+    def make_key(self, lat, lon, preferences):
+        return (geohash.encode(lat, lon, self.precision),) + preference_key(preferences)
+
+    def get(self, lat, lon, preferences):
+        """キャッシュ済みのルートを (lat, lon) 出発に合わせて取得（なければNone）"""
+        key = self.make_key(lat, lon, preferences)
+        entry = self._cache.get(key)
+        if entry is None and self.spill_dir:
+            entry = self._load_spilled(key)
+            if entry is not None:
+                self._cache.put(key, entry)
+        if entry is None:
+            return None
+        return reanchor_routes(entry['routes'], entry['origin'], lat, lon)
+
+    def put(self, lat, lon, preferences, routes):
+        """(lat, lon) 出発で生成したルートを保存"""
+        entry = {'origin': (lat, lon), 'routes': copy.deepcopy(routes), 'saved_at': time.time()}
+        self._cache.put(self.make_key(lat, lon, preferences), entry)
+
+    def get_or_generate(self, lat, lon, preferences, generate):
+        """キャッシュになければ generate() でルートを生成して保存"""
+        routes = self.get(lat, lon, preferences)
+        if routes is None:
+            routes = generate()
+            if routes:
+                self.put(lat, lon, preferences, routes)
+        return routes
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return {**self._cache.stats(), 'spill_writes': self.spill_writes, 'spill_reads': self.spill_reads}
+
+    def _spill_path(self, key):
+        digest = hashlib.sha1(json.dumps(key, ensure_ascii=False).encode('utf-8')).hexdigest()
+        return os.path.join(self.spill_dir, f'{digest}.json')
+
+    def _spill(self, key, entry):
+        """追い出されたエントリをディスクに退避（書きかけを読まないよう置き換えで保存）"""
+        path = self._spill_path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self.spill_writes += 1
+        except OSError:
+            # 退避できなくても再生成すれば済むので無視する
+            pass
+
+    def _load_spilled(self, key):
+        """退避したエントリを読み戻す（期限切れ・壊れたファイルは削除）"""
+        path = self._spill_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        finally:
+            # メモリに戻すか捨てるので、いずれにしてもファイルは残さない
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        if self.ttl is not None and time.time() - entry['saved_at'] > self.ttl:
+            return None
+        self.spill_reads += 1
+        return entry
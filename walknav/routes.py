@@ -0,0 +1,657 @@
+"""散歩ルートの生成
+
+地域種別と利用者の設定からルート種類ごとの周回ルートを作り、安全度・
+歩きやすさ・標高差・見どころ・施設などの情報を付ける。道路グラフがあれば
+実際の道路に沿って探索し、なければ地域に合った形の簡易ルートを作る。
+"""
+import math
+import os
+import random
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import numpy as np
+
+from .edge_costs import preset_name
+from .geo_distance import path_length_km
+from .location import calculate_route_area_scores
+from .resources import (ROUTE_CANDIDATE_PROCESSES, get_edge_cost_table, get_elevation_grid,
+                        get_facility_index, get_route_cache, get_route_candidate_pool,
+                        get_street_graph, get_street_hierarchy)
+from .street_graph import plan_loop_route
+
+
+def generate_detailed_routes_from_gps(detailed_location, preferences):
+    """詳細位置情報に基づいて散歩ルートを生成"""
+    return _generate_routes(detailed_location, preferences)[0]
+
+
+def _generate_routes(detailed_location, preferences):
+    """ルートと、期限で打ち切らずに作れたかどうか"""
+    route_types = get_route_types(detailed_location['area_type'])
+
+    # 候補数の指定があれば、多数の候補から評価の高いルートを選ぶ
+    if ROUTE_CANDIDATE_COUNT > len(route_types):
+        return generate_best_routes(detailed_location, preferences, route_types)
+
+    return [build_route(route_type, detailed_location, preferences) for route_type in route_types], True
+
+
+def get_cached_routes(detailed_location, preferences):
+    """キャッシュ済みのルートを現在地に合わせて取得（なければ生成して保存）
+
+    候補の生成を期限で打ち切った結果は、その場では使うがキャッシュには入れない。
+    """
+    coordinates = detailed_location['coordinates']
+    cache = get_route_cache()
+    routes = cache.get(coordinates['lat'], coordinates['lon'], preferences)
+    if routes is None:
+        routes, complete = _generate_routes(detailed_location, preferences)
+        if routes and complete:
+            cache.put(coordinates['lat'], coordinates['lon'], preferences, routes)
+    return routes
+
+
+def get_route_types(area_type):
+    """エリアタイプに応じたルート種類"""
+    if area_type == '住宅地':
+        return [
+            {'name': '住宅街巡り', 'factor': 0.4, 'safety': 95},
+            {'name': '近所の公園', 'factor': 0.3, 'safety': 90},
+            {'name': '商店街探訪', 'factor': 0.6, 'safety': 85},
+            {'name': '健康ウォーキング', 'factor': 0.8, 'safety': 88}
+        ]
+    elif area_type == '商業・オフィス街':
+        return [
+            {'name': 'ビル街散策', 'factor': 0.5, 'safety': 90},
+            {'name': '都市公園巡り', 'factor': 0.4, 'safety': 85},
+            {'name': 'グルメ街歩き', 'factor': 0.7, 'safety': 80},
+            {'name': '歴史散策', 'factor': 0.6, 'safety': 85}
+        ]
+    else:
+        return [
+            {'name': '地域探索', 'factor': 0.5, 'safety': 80},
+            {'name': '自然散策', 'factor': 0.4, 'safety': 90},
+            {'name': '文化散歩', 'factor': 0.6, 'safety': 85},
+            {'name': '健康コース', 'factor': 0.8, 'safety': 88}
+        ]
+
+
+def get_route_distance(route_type, preferences):
+    """ルート種類と歩行ペースから最大歩行距離（km）を計算"""
+    # 歩行速度を設定（km/h）
+    speed_map = {
+        'slow': 3.0,
+        'normal': 4.0,
+        'fast': 5.0
+    }
+    speed = speed_map.get(preferences.get('mobility', 'normal'), 4.0)
+    walking_time = preferences.get('walking_time', 30)
+    return (walking_time / 60) * speed * route_type['factor']
+
+
+def build_route(route_type, detailed_location, preferences):
+    """ルート種類ごとにルート座標と詳細情報を作成"""
+    current_lat = detailed_location['coordinates']['lat']
+    current_lon = detailed_location['coordinates']['lon']
+    walking_time = preferences.get('walking_time', 30)
+    interests = preferences.get('interests', [])
+
+    max_distance = get_route_distance(route_type, preferences)
+
+    # 道路グラフに沿ったルート、なければ地域特性を考慮した形のルート座標を生成
+    route_coords = generate_street_route(current_lat, current_lon, max_distance, preferences)
+    on_streets = bool(route_coords)
+    if not on_streets:
+        route_coords = generate_shape_route(current_lat, current_lon, max_distance,
+                                            detailed_location['area_type'])
+
+    # 詳細なルート情報を作成
+    route = create_detailed_route_info(
+        route_type['name'], route_coords, max_distance,
+        walking_time * route_type['factor'], interests,
+        detailed_location, route_type['safety']
+    )
+    # 道路に沿ったルートかどうか（キャッシュから別の出発地点に使い回すときの扱いが変わる）
+    route['on_streets'] = on_streets
+    return route
+
+
+# ルート候補の並列生成（プロセスプールで build_route を実行）
+# 候補を多数作って評価の高いものを返す（0なら従来どおり各種類1本ずつ作る）
+ROUTE_CANDIDATE_COUNT = int(os.environ.get('WALK_ROUTE_CANDIDATES', 0))
+ROUTE_CANDIDATE_DEADLINE = float(os.environ.get('WALK_ROUTE_DEADLINE', 3.0))  # 秒
+
+
+# 候補の評価の重み（各項目は0〜1に正規化してから掛ける）
+ROUTE_SCORE_WEIGHTS = {
+    'safety': 0.35,
+    'walkability': 0.25,
+    'elevation': 0.15,
+    'distance': 0.25
+}
+ROUTE_SCORE_MAX_ELEVATION_GAIN = 100  # m（これ以上の上りは同じ評価）
+
+
+def score_route(route, target_distance_km):
+    """安全度・歩きやすさ・上りの少なさ・距離の正確さから候補の評価値（0〜100）を計算"""
+    actual_distance_km = path_length_km(route['coordinates'])
+    distance_error = abs(actual_distance_km - target_distance_km) / max(target_distance_km, 0.1)
+
+    scores = {
+        'safety': route['safety_score'] / 100,
+        'walkability': route['walkability_score'] / 100,
+        'elevation': 1 - min(route['elevation_gain'], ROUTE_SCORE_MAX_ELEVATION_GAIN) / ROUTE_SCORE_MAX_ELEVATION_GAIN,
+        'distance': 1 - min(distance_error, 1.0)
+    }
+    return 100 * sum(ROUTE_SCORE_WEIGHTS[key] * value for key, value in scores.items())
+
+
+def generate_best_routes(detailed_location, preferences, route_types, top_n=None):
+    """ルート候補をプロセスプールで並列に生成し、ルート種類ごとに最も評価の高いものを返す
+
+    返り値は (ルートのリスト, 期限内にすべての候補を作れたか)。
+    同時に投入する候補はプロセス数までにし、1つ終わるごとに次を投入する。
+    ROUTE_CANDIDATE_DEADLINE 秒を過ぎたら残りの候補は投入せず、それまでにできた
+    候補から選ぶ。1本もできなかったルート種類はこの場で1本ずつ順に作る。
+    実行中の候補はプロセスプールでは止められないので、期限後もそれぞれ最後まで
+    動く（プロセス数を超えて溜まることはない）。
+    """
+    top_n = top_n or len(route_types)
+    per_type = max(1, ROUTE_CANDIDATE_COUNT // len(route_types))
+    # ルート種類を順に回して投入し、期限で打ち切られてもどの種類にも候補が残りやすくする
+    pending = [route_type for _ in range(per_type) for route_type in route_types]
+    pending.reverse()
+    deadline = time.monotonic() + ROUTE_CANDIDATE_DEADLINE
+
+    best = {}
+    running = {}
+    try:
+        pool = get_route_candidate_pool()
+        while pending and len(running) < ROUTE_CANDIDATE_PROCESSES:
+            route_type = pending.pop()
+            running[pool.submit(build_route, route_type, detailed_location, preferences)] = route_type
+
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                route_type = running.pop(future)
+                if future.exception() is not None:
+                    if isinstance(future.exception(), BrokenProcessPool):
+                        raise future.exception()
+                    continue
+                route = future.result()
+                route['score'] = score_route(route, get_route_distance(route_type, preferences))
+                if route_type['name'] not in best or route['score'] > best[route_type['name']]['score']:
+                    best[route_type['name']] = route
+                if pending and time.monotonic() < deadline:
+                    route_type = pending.pop()
+                    running[pool.submit(build_route, route_type, detailed_location, preferences)] = route_type
+    except BrokenProcessPool:
+        # 子プロセスが異常終了したプールは使えないので、次回は作り直す
+        get_route_candidate_pool.clear()
+
+    complete = not pending and not running
+
+    # 期限内に1本もできなかったルート種類は順に1本ずつ作る
+    for route_type in route_types:
+        if route_type['name'] not in best:
+            route = build_route(route_type, detailed_location, preferences)
+            route['score'] = score_route(route, get_route_distance(route_type, preferences))
+            best[route_type['name']] = route
+
+    routes = sorted(best.values(), key=lambda route: route['score'], reverse=True)[:top_n]
+    return routes, complete
+
+
+def generate_area_aware_route(start_lat, start_lon, distance_km, area_type, location_info, preferences=None):
+    """エリアの特性を考慮したルート生成"""
+    # 道路ネットワークがあれば実際の道路に沿った周回ルートを探索
+    coords = generate_street_route(start_lat, start_lon, distance_km, preferences)
+    if coords:
+        return coords
+    return generate_shape_route(start_lat, start_lon, distance_km, area_type)
+
+
+def generate_street_route(start_lat, start_lon, distance_km, preferences=None):
+    """道路グラフに沿った周回ルート（道路グラフがない・作れない場合はNone）
+
+    座標の最初と最後は現在地で、その間は道路グラフのノード列。
+    """
+    street_graph = get_street_graph()
+    if street_graph is None:
+        return None
+
+    preferences = preferences or {}
+    safety_level = preferences.get('safety_level', 'high')
+    mobility = preferences.get('mobility', 'normal')
+
+    cost_table = get_edge_cost_table()
+    if cost_table is None:
+        weights, router = None, get_street_hierarchy()
+    else:
+        # 安全重視度・歩行ペースに応じた辺コストで探索（同じコストの縮約階層があれば使う）
+        weights = cost_table.weights(safety_level, mobility)
+        router = get_street_hierarchy(preset_name(safety_level, mobility))
+
+    return plan_loop_route(street_graph, start_lat, start_lon, distance_km,
+                           router=router, weights=weights)
+
+
+def generate_shape_route(start_lat, start_lon, distance_km, area_type):
+    """エリアタイプに応じた形の簡易ルート（道路グラフがないときに使う）"""
+    if area_type == '住宅地':
+        # 住宅街は格子状の道路が多い
+        return generate_grid_route(start_lat, start_lon, distance_km)
+    elif area_type == '商業・オフィス街':
+        # 商業地は放射状の道路が多い
+        return generate_radial_route(start_lat, start_lon, distance_km)
+    else:
+        # 一般的な循環ルート
+        return generate_circular_route(start_lat, start_lon, distance_km)
+
+
+def generate_grid_route(start_lat, start_lon, distance_km):
+    """格子状ルートの生成"""
+    coords = [[start_lat, start_lon]]
+
+    # 1km = 約0.009度 (緯度), 約0.011度 (経度)
+    lat_per_km = 0.009
+    lon_per_km = 0.011
+
+    segment_distance = distance_km / 8  # 8セグメントに分割
+
+    current_lat, current_lon = start_lat, start_lon
+
+    # 格子状に移動
+    directions = [
+        (0, 1),   # 東
+        (1, 0),   # 北
+        (0, -1),  # 西
+        (-1, 0),  # 南
+        (0, 1),   # 東
+        (1, 0),   # 北
+        (0, -1),  # 西
+        (-1, 0)   # 南（スタートに戻る）
+    ]
+
+    for i, (lat_dir, lon_dir) in enumerate(directions):
+        # 少しランダムネスを追加
+        noise = random.uniform(0.5, 1.5)
+
+        lat_change = lat_dir * segment_distance * lat_per_km * noise
+        lon_change = lon_dir * segment_distance * lon_per_km * noise
+
+        current_lat += lat_change
+        current_lon += lon_change
+        coords.append([current_lat, current_lon])
+
+    return coords
+
+
+def generate_radial_route(start_lat, start_lon, distance_km):
+    """放射状ルートの生成"""
+    coords = [[start_lat, start_lon]]
+
+    lat_per_km = 0.009
+    lon_per_km = 0.011
+
+    num_spokes = 6  # 6方向に放射
+    spoke_distance = distance_km / (num_spokes * 2)  # 往復考慮
+
+    current_lat, current_lon = start_lat, start_lon
+
+    for i in range(num_spokes):
+        angle = (i * 2 * math.pi) / num_spokes
+
+        # 外向きに移動
+        lat_change = spoke_distance * lat_per_km * math.cos(angle)
+        lon_change = spoke_distance * lon_per_km * math.sin(angle)
+
+        current_lat += lat_change
+        current_lon += lon_change
+        coords.append([current_lat, current_lon])
+
+        # 中心に戻る
+        coords.append([start_lat, start_lon])
+        current_lat, current_lon = start_lat, start_lon
+
+    return coords
+
+
+def generate_circular_route(start_lat, start_lon, distance_km):
+    """円形ルートの生成"""
+    coords = [[start_lat, start_lon]]
+
+    lat_per_km = 0.009
+    lon_per_km = 0.011
+
+    num_points = max(8, int(distance_km * 4))
+    radius = distance_km / (2 * math.pi)
+
+    for i in range(1, num_points + 1):
+        angle = (i * 2 * math.pi) / num_points
+
+        # 楕円形にして自然な形に
+        lat_radius = radius * lat_per_km * random.uniform(0.8, 1.2)
+        lon_radius = radius * lon_per_km * random.uniform(0.8, 1.2)
+
+        lat = start_lat + lat_radius * math.cos(angle)
+        lon = start_lon + lon_radius * math.sin(angle)
+
+        coords.append([lat, lon])
+
+    # スタート地点に戻る
+    coords.append([start_lat, start_lon])
+    return coords
+
+
+def create_detailed_route_info(name, coords, distance_km, time_minutes, interests, location_info, base_safety):
+    """ルートの概要情報を作成（見どころなどの詳細は get_route_details で表示時に作成）"""
+    # 安全度をルート沿いの地域特性で調整
+    safety_rating, walkability_score = calculate_route_area_scores(coords, location_info)
+    adjusted_safety = min(100, base_safety + (safety_rating - 80) * 0.5)
+
+    return {'id': f"detailed_{name.lower().replace(' ', '_')}_{uuid.uuid4().hex[:8]}",
+        'name': f"{name}（{location_info['neighborhood']}発）",
+        'description': f"{location_info['district']}周辺の{distance_km:.1f}km散歩コース",
+        'distance': f"{distance_km:.1f}km",
+        'time': f"{time_minutes:.0f}分",
+        'difficulty': get_difficulty_level(distance_km, time_minutes),
+        'safety_score': adjusted_safety,
+        'walkability_score': walkability_score,
+        'heatstroke_risk': evaluate_heatstroke_risk(time_minutes),
+        'coordinates': coords,
+        'elevation_gain': calculate_elevation_gain(coords, location_info['elevation']),
+        'area_info': {
+            'prefecture': location_info['prefecture'],
+            'city': location_info['city'],
+            'ward': location_info['ward'],
+            'district': location_info['district'],
+            'neighborhood': location_info['neighborhood'],
+            'area_type': location_info['area_type'],
+            'nearest_station': location_info['nearest_station'],
+            'nearest_landmark': location_info['nearest_landmark']
+        },
+        # 詳細情報の作成に使う入力
+        'detail_inputs': {
+            'interests': list(interests),
+            'time_minutes': time_minutes,
+            'location_info': location_info
+        }
+    }
+
+
+def build_route_details(route):
+    """ルートの詳細情報（見どころ・施設・天気・交通安全など）を作成"""
+    inputs = route['detail_inputs']
+    location_info = inputs['location_info']
+    coords = route['coordinates']
+
+    return {
+        # 地域情報を反映した見どころ
+        'highlights': generate_area_specific_highlights(inputs['interests'], location_info),
+        # 地域の特性を反映した施設情報
+        'facilities': generate_local_facilities(coords, location_info),
+        'weather_consideration': get_weather_recommendations(inputs['time_minutes']),
+        'accessibility': evaluate_accessibility(route['walkability_score']),
+        'best_time': get_best_walking_time(location_info['area_type']),
+        'traffic_info': get_traffic_safety_info(coords, location_info)
+    }
+
+
+
+def generate_area_specific_highlights(interests, location_info):
+    """地域特有の見どころを生成"""
+    highlights = []
+    area_type = location_info['area_type']
+
+    base_highlights = {
+        '住宅地': [
+            '静かな住宅街の風景',
+            '地域の小さな神社',
+            '近所の公園',
+            '古い商店街',
+            '桜並木（季節限定）'
+        ],
+        '商業・オフィス街': [
+            '高層ビル群の景観',
+            '都市公園',
+            '歴史的建造物',
+            'アートインスタレーション',
+            '商業施設'
+        ],
+        '工業・住宅地': [
+            '多摩川の景色',
+            '工場夜景',
+            '地域の歴史',
+            '橋からの眺望',
+            '季節の花々'
+        ],
+        '観光・商業地': [
+            '観光名所',
+            '文化施設',
+            'グルメスポット',
+            '伝統的建築',
+            '写真映えスポット'
+        ]
+    }
+
+    # 地域タイプに応じた基本的な見どころ
+    if area_type in base_highlights:
+        highlights.extend(random.sample(base_highlights[area_type], min(3, len(base_highlights[area_type]))))
+
+    # 興味に応じた追加見どころ
+    if '歴史・文化' in interests:
+        highlights.append(f"{location_info['neighborhood']}の歴史的背景")
+    if '自然・公園' in interests:
+        highlights.append('季節の植物観察')
+    if 'グルメ' in interests:
+        highlights.append('地元のお店')
+    if '写真撮影' in interests:
+        highlights.append('フォトスポット')
+
+    return highlights[:4]  # 最大4つまで
+
+
+# ルート沿いの施設の検索範囲と表示件数
+FACILITY_BUFFER_M = 100  # ルートからこの距離以内の施設を表示
+FACILITY_LIMIT = 20
+
+
+def generate_local_facilities(coords, location_info):
+    """地域の施設情報を生成"""
+    # 施設データがあればルート沿いの実在の施設を出発地点から近い順に返す
+    # （見つからなければ空。架空の施設は施設データがないときだけ使う）
+    facility_index = get_facility_index()
+    if facility_index is not None:
+        nearby = facility_index.along_route(coords, buffer_m=FACILITY_BUFFER_M, limit=FACILITY_LIMIT)
+        return [dict(facility, distance=f"出発から{facility['along_m']:.0f}m") for facility in nearby]
+
+    facilities = []
+
+    # 基本施設
+    basic_facilities = [
+        {'type': 'コンビニ', 'distance': '150m', 'name': 'セブンイレブン'},
+        {'type': 'コンビニ', 'distance': '200m', 'name': 'ローソン'},
+        {'type': 'トイレ', 'distance': '300m', 'name': '公衆トイレ'},
+        {'type': '自動販売機', 'distance': '100m', 'name': '飲み物'},
+        {'type': 'ベンチ', 'distance': '250m', 'name': '休憩所'}
+    ]
+
+    # 地域特有の施設
+    area_specific = {
+        '住宅地': [
+            {'type': '薬局', 'distance': '400m', 'name': 'ドラッグストア'},
+            {'type': '公園', 'distance': '500m', 'name': '近隣公園'},
+            {'type': '交番', 'distance': '600m', 'name': '地域交番'}
+        ],
+        '商業・オフィス街': [
+            {'type': 'カフェ', 'distance': '200m', 'name': 'スターバックス'},
+            {'type': '銀行', 'distance': '300m', 'name': 'ATM'},
+            {'type': '病院', 'distance': '800m', 'name': '総合病院'}
+        ],
+        '工業・住宅地': [
+            {'type': 'スーパー', 'distance': '500m', 'name': '地元スーパー'},
+            {'type': 'ガソリンスタンド', 'distance': '600m', 'name': 'ENEOS'},
+            {'type': '郵便局', 'distance': '700m', 'name': '川崎郵便局'}
+        ]
+    }
+
+    # 基本施設をランダムに選択
+    facilities.extend(random.sample(basic_facilities, 3))
+
+    # 地域特有施設を追加
+    area_type = location_info['area_type']
+    if area_type in area_specific:
+        facilities.extend(random.sample(area_specific[area_type], 2))
+
+    return facilities
+
+
+def get_difficulty_level(distance_km, time_minutes):
+    """難易度レベルを判定"""
+    if distance_km < 2 and time_minutes < 30:
+        return "初心者向け"
+    elif distance_km < 4 and time_minutes < 60:
+        return "中級者向け"
+    else:
+        return "上級者向け"
+
+
+def evaluate_heatstroke_risk(time_minutes):
+    """熱中症リスクを評価"""
+    current_hour = datetime.now().hour
+
+    if 11 <= current_hour <= 15:  # 日中の暑い時間
+        if time_minutes > 45:
+            return "高リスク"
+        elif time_minutes > 30:
+            return "中リスク"
+        else:
+            return "低リスク"
+    else:
+        return "低リスク"
+
+
+def calculate_elevation_gain(coords, base_elevation):
+    """標高差を計算"""
+    # 標高グリッドがあればルート全体の標高をまとめて補間して累積獲得標高を求める
+    elevation_grid = get_elevation_grid()
+    if elevation_grid is not None and len(coords) > 1:
+        elevations, cumulative_gain = elevation_grid.profile(coords)
+        if not np.isnan(elevations).any():
+            return max(0, int(cumulative_gain[-1]))
+
+    # 簡易的な標高変化計算
+    total_gain = 0
+    prev_elevation = base_elevation
+
+    for i, coord in enumerate(coords[1:], 1):
+        # 座標変化に基づいて標高変化を推定
+        lat_change = coord[0] - coords[i-1][0]
+        elevation_change = lat_change * 1000  # 簡易計算
+
+        current_elevation = max(0, prev_elevation + elevation_change)
+        if current_elevation > prev_elevation:
+            total_gain += current_elevation - prev_elevation
+
+        prev_elevation = current_elevation
+
+    return max(0, int(total_gain))
+
+
+def get_weather_recommendations(time_minutes):
+    """天気に応じた推奨事項"""
+    current_hour = datetime.now().hour
+
+    recommendations = []
+
+    if 6 <= current_hour <= 18:  # 日中
+        recommendations.append("帽子と日焼け止めを忘れずに")
+        recommendations.append("水分補給を定期的に")
+    else:  # 夜間
+        recommendations.append("反射材付きの服装を推奨")
+        recommendations.append("懐中電灯やスマホライトを準備")
+
+    if time_minutes > 30:
+        recommendations.append("途中で休憩を取りましょう")
+
+    return recommendations
+
+
+def evaluate_accessibility(walkability_score):
+    """アクセシビリティを評価"""
+    if walkability_score >= 80:
+        return {
+            'level': '良好',
+            'description': '歩道が整備されており、車椅子でも通行しやすい'
+        }
+    elif walkability_score >= 60:
+        return {
+            'level': '普通',
+            'description': '一般的な歩行者向け。一部段差あり'
+        }
+    else:
+        return {
+            'level': '注意',
+            'description': '歩道が狭い箇所や段差があります'
+        }
+
+
+def get_best_walking_time(area_type):
+    """最適な散歩時間を提案"""
+    current_hour = datetime.now().hour
+
+    if area_type == '商業・オフィス街':
+        if 7 <= current_hour <= 9 or 17 <= current_hour <= 19:
+            return "通勤ラッシュ時間のため、10時頃または15時頃がおすすめ"
+        else:
+            return "現在の時間帯は散歩に適しています"
+    elif area_type == '住宅地':
+        if 22 <= current_hour or current_hour <= 6:
+            return "住宅街のため、日中（7時～21時）の散歩がおすすめ"
+        else:
+            return "静かな住宅街での散歩に適した時間です"
+    else:
+        return "いつでも散歩をお楽しみいただけます"
+
+
+def get_traffic_safety_info(coords, location_info):
+    """交通安全情報を取得"""
+    safety_info = {
+        'traffic_volume': 'medium',
+        'crosswalk_count': len(coords) // 4,  # 大雑把な横断歩道数
+        'safety_tips': []
+    }
+
+    area_type = location_info['area_type']
+
+    if area_type == '商業・オフィス街':
+        safety_info['traffic_volume'] = 'high'
+        safety_info['safety_tips'] = [
+            '交差点では信号をしっかり確認',
+            '歩道を歩き、車道に出ないよう注意',
+            '自転車との接触に注意'
+        ]
+    elif area_type == '住宅地':
+        safety_info['traffic_volume'] = 'low'
+        safety_info['safety_tips'] = [
+            '住宅街では車の出入りに注意',
+            '子どもの飛び出しに注意',
+            '夜間は明るい道を選択'
+        ]
+    else:
+        safety_info['safety_tips'] = [
+            '歩行者優先の道路を選択',
+            '見通しの良い道を歩く',
+            '不明な場所では地図を確認'
+        ]
+
+    return safety_info
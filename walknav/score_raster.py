@@ -0,0 +1,203 @@
+"""安全度・歩きやすさのラスター
+
+街灯・歩道・犯罪統計のオープンデータ（CSV）から、緯度経度の等間隔グリッドの
+セルごとに安全度と歩きやすさを事前に計算し、uint8 の2バンドで保存する。
+参照はセル番号の計算だけで済み、ルートの全区間もまとめて評価できる。
+
+    python -m walknav.score_raster --bounds 35.45 139.55 35.75 139.85 --cell 0.001 \
+        --lights lights.csv --sidewalks sidewalks.csv --crimes crimes.csv data/scores.raster
+"""
+import argparse
+import csv
+import struct
+
+import numpy as np
+
+from .geo_distance import segment_distances
+
+# ヘッダー: マジック, 版, バンド数, 行数, 列数, 南西端の緯度・経度, 緯度・経度の間隔
+_MAGIC = b'WSCR'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHII4d')
+HEADER_SIZE = 64
+
+BANDS = ('safety', 'walkability')
+NODATA = 255
+
+# 元の計算式と同じ範囲に収める（最低点, 最高点）
+SAFETY_RANGE = (60, 100)
+WALKABILITY_RANGE = (50, 100)
+
+
+def write_raster(path, bands, south, west, dlat, dlon):
+    """uint8 の2次元配列（行は南から北）のリストをラスターファイルに保存"""
+    bands = [np.asarray(band, dtype=np.uint8) for band in bands]
+    rows, cols = bands[0].shape
+    header = _HEADER.pack(_MAGIC, _VERSION, len(bands), rows, cols, south, west, dlat, dlon)
+    with open(path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        for band in bands:
+            f.write(band.tobytes())
+
+
+class ScoreRaster:
+    """メモリマップした安全度・歩きやすさのラスター（値のない所は None / NaN）"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, band_count, rows, cols, south, west, dlat, dlon = \
+                _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION or band_count != len(BANDS):
+            raise ValueError(f'ラスターの形式が不正です: {path}')
+
+        self.rows, self.cols = rows, cols
+        self.south, self.west = south, west
+        self.dlat, self.dlon = dlat, dlon
+        self.values = np.asarray(np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER_SIZE,
+                                           shape=(band_count, rows, cols)))
+
+    def _cells(self, lats, lons):
+        """各地点のセルの行・列と、範囲内かどうか"""
+        rows = np.floor((np.asarray(lats, dtype=np.float64) - self.south) / self.dlat).astype(np.intp)
+        cols = np.floor((np.asarray(lons, dtype=np.float64) - self.west) / self.dlon).astype(np.intp)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        return np.where(inside, rows, 0), np.where(inside, cols, 0), inside
+
+    def lookup(self, lat, lon):
+        """1地点のスコア（{'safety': int, 'walkability': int}、範囲外・値なしはNone）"""
+        row = int((lat - self.south) // self.dlat)
+        col = int((lon - self.west) // self.dlon)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        scores = {band: int(self.values[i, row, col]) for i, band in enumerate(BANDS)}
+        return {band: (None if value == NODATA else value) for band, value in scores.items()}
+
+    def lookup_many(self, lats, lons):
+        """複数地点のスコアを一括取得（バンドごとの float 配列、範囲外・値なしはNaN）"""
+        rows, cols, inside = self._cells(lats, lons)
+        result = {}
+        for i, band in enumerate(BANDS):
+            values = self.values[i, rows, cols].astype(np.float64)
+            values[~inside | (values == NODATA)] = np.nan
+            result[band] = values
+        return result
+
+    def route_scores(self, coords):
+        """ルートの各区間のスコアと、距離で重み付けした平均・最低値
+
+        区間の中点のセルをその区間のスコアとする。値のない区間は集計から除く。
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if len(coords) < 2:
+            return None
+
+        lats, lons = coords[:, 0], coords[:, 1]
+        lengths = segment_distances(lats, lons)
+        segments = self.lookup_many((lats[:-1] + lats[1:]) / 2, (lons[:-1] + lons[1:]) / 2)
+
+        summary = {'segments': segments}
+        for band, values in segments.items():
+            valid = ~np.isnan(values)
+            weight = lengths[valid].sum()
+            if not valid.any():
+                summary[band] = None
+                summary[f'min_{band}'] = None
+            else:
+                mean = (values[valid] * lengths[valid]).sum() / weight if weight > 0 else values[valid].mean()
+                summary[band] = float(mean)
+                summary[f'min_{band}'] = float(values[valid].min())
+        return summary
+
+
+def load_weighted_points(path, weight_column=None):
+    """lat, lon 列（と任意の重みの列）を持つCSVを配列で読み込む"""
+    lats, lons, weights = [], [], []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lon = float(row['lat']), float(row['lon'])
+                weight = float(row[weight_column]) if weight_column and row.get(weight_column) else 1.0
+            except (KeyError, TypeError, ValueError):
+                continue
+            lats.append(lat)
+            lons.append(lon)
+            weights.append(weight)
+    return np.array(lats), np.array(lons), np.array(weights)
+
+
+def _density(points, south, west, dlat, dlon, rows, cols, radius=1):
+    """地点の重みをセルに集計し、周囲 radius セルの合計をとる（近くの設備も効くように）"""
+    grid = np.zeros((rows, cols), dtype=np.float64)
+    if points is None:
+        return grid
+
+    lats, lons, weights = points
+    r = np.floor((lats - south) / dlat).astype(np.intp)
+    c = np.floor((lons - west) / dlon).astype(np.intp)
+    inside = (r >= 0) & (r < rows) & (c >= 0) & (c < cols)
+    np.add.at(grid, (r[inside], c[inside]), weights[inside])
+
+    padded = np.pad(grid, radius)
+    smoothed = np.zeros_like(grid)
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            smoothed += padded[dy:dy + rows, dx:dx + cols]
+    return smoothed
+
+
+def _normalize(density):
+    """上位5%の密度を1とした0〜1の値に変換"""
+    positive = density[density > 0]
+    if not len(positive):
+        return np.zeros_like(density)
+    return np.clip(density / np.percentile(positive, 95), 0, 1)
+
+
+def _to_score(value, score_range):
+    low, high = score_range
+    return np.round(low + value * (high - low)).astype(np.uint8)
+
+
+def build_score_raster(bounds, cell_deg, lights=None, sidewalks=None, crimes=None):
+    """データ（load_weighted_points の結果）からラスターのバンドを計算
+
+    安全度は街灯が多く犯罪が少ないほど、歩きやすさは歩道が多いほど高くなる。
+    返り値は (バンドのリスト, 南端, 西端, 緯度の間隔, 経度の間隔)。
+    """
+    south, west, north, east = bounds
+    rows = int(np.ceil((north - south) / cell_deg))
+    cols = int(np.ceil((east - west) / cell_deg))
+    grid = (south, west, cell_deg, cell_deg, rows, cols)
+
+    light = _normalize(_density(lights, *grid))
+    crime = _normalize(_density(crimes, *grid))
+    sidewalk = _normalize(_density(sidewalks, *grid))
+
+    safety = _to_score(0.6 * light + 0.4 * (1 - crime), SAFETY_RANGE)
+    walkability = _to_score(0.7 * sidewalk + 0.3 * light, WALKABILITY_RANGE)
+    return [safety, walkability], south, west, cell_deg, cell_deg
+
+
+def main():
+    parser = argparse.ArgumentParser(description='安全度・歩きやすさのラスターを作成')
+    parser.add_argument('output')
+    parser.add_argument('--bounds', type=float, nargs=4, required=True,
+                        metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'))
+    parser.add_argument('--cell', type=float, default=0.001, help='セルの大きさ（度）')
+    parser.add_argument('--lights', help='街灯の位置（lat, lon）')
+    parser.add_argument('--sidewalks', help='歩道の位置（lat, lon, 任意で length_m）')
+    parser.add_argument('--crimes', help='犯罪の発生地点（lat, lon, 任意で count）')
+    args = parser.parse_args()
+
+    bands, south, west, dlat, dlon = build_score_raster(
+        args.bounds, args.cell,
+        lights=load_weighted_points(args.lights) if args.lights else None,
+        sidewalks=load_weighted_points(args.sidewalks, 'length_m') if args.sidewalks else None,
+        crimes=load_weighted_points(args.crimes, 'count') if args.crimes else None
+    )
+    write_raster(args.output, bands, south, west, dlat, dlon)
+    print(f'ラスター: {bands[0].shape[0]} x {bands[0].shape[1]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""UIなしでの散歩のシミュレーション
+
+仮想の時計で散歩の開始・進捗の更新・終了を繰り返し、散歩の流れ全体
+（測位の平滑化・地域情報の付加・記録の作成）を Streamlit なしで動かす。
+ルートの生成と測位の乱数は散歩ごとの seed で固定するので、同じ引数なら
+同じ散歩記録になる。回帰テストや負荷試験（処理できる散歩数・測位数）に使う。
+
+    python -m walknav.simulation --walks 1000 --source route --workers 8
+    python -m walknav.simulation --walks 100 --source replay --replay walk.gpx --speed 10
+"""
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .geo_distance import path_length_km
+from .location_sources import RandomWalkSource, ReplaySource, RouteWalkerSource, load_track
+from .routes import generate_circular_route
+from .tracking import finish_walking_session, start_walking_session, update_walking_progress
+
+# 仮想の時計の開始時刻（UNIX時刻の秒）
+SIMULATION_EPOCH = 1_700_000_000.0
+
+ORIGIN = (35.5308, 139.7029)  # 川崎駅周辺
+
+
+def simulation_route(seed, distance_km=3.0, origin=ORIGIN):
+    """散歩ごとの seed で決まる周回ルート（ルート選択画面のルートと同じ形式の一部）"""
+    random.seed(seed)
+    coords = generate_circular_route(origin[0], origin[1], distance_km)
+    length_km = path_length_km(coords)
+    return {
+        'id': f'sim_{seed}',
+        'name': f'シミュレーション {seed}',
+        'distance': f'{length_km:.1f}km',
+        'time': f'{length_km / 4.5 * 60:.0f}分',
+        'coordinates': coords
+    }
+
+
+def simulate_walk(route, source, step_s=1.0, max_duration_s=7200, start=SIMULATION_EPOCH):
+    """仮想の時計で1回の散歩を最後まで進め、散歩記録を返す
+
+    step_s 秒ごとに進捗を更新し、取得元が終わるか max_duration_s 秒たったら
+    散歩を終了する。散歩記録には仮想の経過時間・更新回数・測位の件数を加える。
+    """
+    state = {}
+    now = start
+    start_walking_session(state, route, location_source=source, now=now)
+    smoother = state['gps_smoother']
+
+    updates = 0
+    while now - start < max_duration_s and not source.finished:
+        now += step_s
+        update_walking_progress(state, now)
+        updates += 1
+
+    points = len(state['walking_path'])
+    record = finish_walking_session(state, now)
+    record.update({
+        'simulated_s': now - start,
+        'updates': updates,
+        'fixes_accepted': smoother.accepted,
+        'fixes_rejected': smoother.rejected,
+        'points': points
+    })
+    return record
+
+
+def _run_one(seed, source_kind, distance_km, step_s, max_duration_s, replay_points, replay_speed):
+    route = simulation_route(seed, distance_km)
+    if source_kind == 'route':
+        source = RouteWalkerSource(route['coordinates'], seed=seed)
+    elif source_kind == 'replay':
+        source = ReplaySource(replay_points, replay_speed)
+    else:
+        source = RandomWalkSource(start={'lat': ORIGIN[0], 'lon': ORIGIN[1]}, seed=seed)
+    record = simulate_walk(route, source, step_s, max_duration_s)
+    record['seed'] = seed
+    return record
+
+
+def run_simulations(walks, source_kind='route', seed=0, workers=1, distance_km=3.0,
+                    step_s=1.0, max_duration_s=7200, replay_points=None, replay_speed=1.0):
+    """walks 回の散歩をシミュレートし、seed 順の散歩記録のリストを返す
+
+    workers が2以上ならプロセスに分けて並列に実行する（結果は同じ）。
+    """
+    seeds = range(seed, seed + walks)
+    args = (source_kind, distance_km, step_s, max_duration_s, replay_points, replay_speed)
+    if workers <= 1:
+        return [_run_one(walk_seed, *args) for walk_seed in seeds]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_one, walk_seed, *args) for walk_seed in seeds]
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UIなしで散歩をシミュレート')
+    parser.add_argument('--walks', type=int, default=100)
+    parser.add_argument('--source', choices=('random', 'route', 'replay'), default='route')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--distance', type=float, default=3.0, help='ルートの距離（km）')
+    parser.add_argument('--step', type=float, default=1.0, help='進捗を更新する間隔（仮想の秒）')
+    parser.add_argument('--max-duration', type=float, default=7200, help='1回の散歩の上限（仮想の秒）')
+    parser.add_argument('--replay', help='replay で再生する経路（GPX / CSV）')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay の再生速度（倍）')
+    parser.add_argument('--output', help='散歩記録をJSONで書き出すパス')
+    args = parser.parse_args()
+
+    if args.source == 'replay' and not args.replay:
+        parser.error('--source replay には --replay が必要です')
+    replay_points = load_track(args.replay) if args.replay else None
+
+    started = time.perf_counter()
+    records = run_simulations(args.walks, args.source, args.seed, args.workers, args.distance,
+                              args.step, args.max_duration, replay_points, args.speed)
+    elapsed = time.perf_counter() - started
+
+    fixes = sum(record['fixes_accepted'] + record['fixes_rejected'] for record in records)
+    updates = sum(record['updates'] for record in records)
+    distance = sum(record['actual_distance_km'] for record in records)
+    print(f'散歩: {len(records)} 回  測位: {fixes} 件  更新: {updates} 回  歩行距離: {distance:.1f} km')
+    print(f'所要時間: {elapsed:.2f} 秒  ({len(records) / elapsed:.1f} 散歩/秒, '
+          f'{fixes / elapsed:.0f} 測位/秒, {updates / elapsed:.0f} 更新/秒)')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
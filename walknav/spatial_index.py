@@ -0,0 +1,190 @@
+import csv
+import math
+import os
+
+import numpy as np
+
+from .geo_distance import EARTH_RADIUS_KM, distance_to_many
+
+# 緯度1度あたりの距離（km）
+KM_PER_DEG_LAT = 111.195
+
+
+class SpatialIndex:
+    """緯度経度グリッドによる近傍点インデックス
+
+    点をグリッドセル番号でソートして保持し、検索時は対象範囲のセル行ごとに
+    二分探索で候補を切り出してから正確な距離で絞り込む。
+    """
+
+    def __init__(self, lats, lons, names=None, attrs=None, cell_deg=0.02):
+        self.cell_deg = cell_deg
+        self._n_cols = int(math.ceil(360.0 / cell_deg))
+        self._n_rows = int(math.ceil(180.0 / cell_deg))
+
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.names = names
+        self.attrs = attrs
+
+        rows, cols = self._cells(self.lats, self.lons)
+        keys = rows * self._n_cols + cols
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+
+    @classmethod
+    def from_points(cls, points, cell_deg=0.02):
+        """name, lat, lon（と任意の属性）を持つ辞書のリストから構築"""
+        return cls(
+            [p['lat'] for p in points],
+            [p['lon'] for p in points],
+            names=np.array([p['name'] for p in points], dtype=object),
+            # 名前・座標以外の属性（種別など）はそのまま保持
+            attrs=[{k: v for k, v in p.items() if k not in ('name', 'lat', 'lon')} for p in points],
+            cell_deg=cell_deg
+        )
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cells(self, lats, lons):
+        """座標からグリッドの行・列番号を計算"""
+        rows = np.floor((np.asarray(lats) + 90.0) / self.cell_deg).astype(np.int64)
+        cols = np.floor((np.asarray(lons) + 180.0) / self.cell_deg).astype(np.int64)
+        rows = np.clip(rows, 0, self._n_rows - 1)
+        cols = np.clip(cols, 0, self._n_cols - 1)
+        return rows, cols
+
+    def _candidates(self, lat, lon, radius_km):
+        """半径内に掛かるセルに含まれる点の番号を取得"""
+        lat_span = radius_km / KM_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(min(89.0, abs(lat) + lat_span))), 1e-6)
+        lon_span = min(180.0, lat_span / cos_lat)
+
+        (row_min, row_max), (col_min, col_max) = self._cells(
+            [lat - lat_span, lat + lat_span], [lon - lon_span, lon + lon_span]
+        )
+
+        row_ids = np.arange(row_min, row_max + 1, dtype=np.int64)
+        starts = np.searchsorted(self._keys, row_ids * self._n_cols + col_min, side='left')
+        ends = np.searchsorted(self._keys, row_ids * self._n_cols + col_max, side='right')
+
+        slices = [self._order[s:e] for s, e in zip(starts, ends) if e > s]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def corridor_pairs(self, lats, lons, buffer_km):
+        """経路（緯度経度の列）の各区間と、その区間から buffer_km 以内に掛かるセルの点の組
+
+        返り値は (点の番号, 区間の番号) の配列の組。同じ点が複数の区間と組になる。
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        n_segments = len(lats) - 1
+        if len(self) == 0 or n_segments < 1:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        # セルを飛ばさないよう、各区間をセルの大きさより細かく分割した点（両端を含む）で被覆を求める
+        steps = np.maximum(1, np.ceil(np.maximum(
+            np.abs(np.diff(lats)), np.abs(np.diff(lons))) / self.cell_deg)).astype(np.int64) + 1
+        seg = np.repeat(np.arange(n_segments), steps)
+        frac = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(steps - 1, steps)
+        sample_lats = lats[seg] + np.diff(lats)[seg] * frac
+        sample_lons = lons[seg] + np.diff(lons)[seg] * frac
+
+        lat_span = buffer_km / KM_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(min(89.0, np.abs(lats).max() + lat_span))), 1e-6)
+        row_pad = int(math.ceil(lat_span / self.cell_deg))
+        col_pad = int(math.ceil(lat_span / cos_lat / self.cell_deg))
+
+        rows, cols = self._cells(sample_lats, sample_lons)
+        dr, dc = np.meshgrid(np.arange(-row_pad, row_pad + 1), np.arange(-col_pad, col_pad + 1), indexing='ij')
+        rows = np.clip(rows[:, None] + dr.ravel(), 0, self._n_rows - 1)
+        cols = np.clip(cols[:, None] + dc.ravel(), 0, self._n_cols - 1)
+        cell_segments = np.unique((rows * self._n_cols + cols) * n_segments + seg[:, None])
+        keys, segments = np.divmod(cell_segments, n_segments)
+
+        # (セル, 区間) の組ごとに、セル内の点の範囲を展開する
+        starts = np.searchsorted(self._keys, keys, side='left')
+        ends = np.searchsorted(self._keys, keys, side='right')
+        lengths = ends - starts
+        total = int(lengths.sum())
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return self._order[positions], np.repeat(segments, lengths)
+
+    def query(self, lat, lon, k=1, radius_km=None):
+        """半径内の近い順にk件の点を検索
+
+        radius_km を省略した場合は、k件見つかるまで検索範囲を広げる。
+        """
+        if len(self) == 0 or k <= 0:
+            return []
+
+        if radius_km is not None:
+            idx = self._candidates(lat, lon, radius_km)
+            dist = distance_to_many(lat, lon, self.lats[idx], self.lons[idx])
+            mask = dist <= radius_km
+            return self._top_k(idx[mask], dist[mask], k)
+
+        # 見つかるまで半径を倍々に広げる（半径内の点は全て候補に含まれるので結果は正確）
+        search_radius = self.cell_deg * KM_PER_DEG_LAT
+        max_radius = math.pi * EARTH_RADIUS_KM
+        while True:
+            idx = self._candidates(lat, lon, search_radius)
+            dist = distance_to_many(lat, lon, self.lats[idx], self.lons[idx])
+            mask = dist <= search_radius
+            if mask.sum() >= min(k, len(self)) or search_radius >= max_radius:
+                return self._top_k(idx[mask], dist[mask], k)
+            search_radius *= 2
+
+    def nearest(self, lat, lon, radius_km=None):
+        """最も近い1点を検索（見つからない場合はNone）"""
+        results = self.query(lat, lon, k=1, radius_km=radius_km)
+        return results[0] if results else None
+
+    def _top_k(self, idx, dist, k):
+        """距離の小さい順にk件を結果形式に変換"""
+        if len(idx) > k:
+            part = np.argpartition(dist, k - 1)[:k]
+            idx, dist = idx[part], dist[part]
+        order = np.argsort(dist, kind='stable')
+
+        results = []
+        for i, d in zip(idx[order], dist[order]):
+            result = {
+                'index': int(i),
+                'name': self.names[i] if self.names is not None else None,
+                'lat': float(self.lats[i]),
+                'lon': float(self.lons[i]),
+                'distance_km': float(d)
+            }
+            if self.attrs is not None:
+                result.update(self.attrs[i])
+            results.append(result)
+        return results
+
+
+def load_points_csv(path):
+    """name, lat, lon 列を持つCSVから地点データを読み込む"""
+    points = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            try:
+                point = dict(row)
+                point['lat'] = float(row['lat'])
+                point['lon'] = float(row['lon'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            points.append(point)
+    return points
+
+
+def build_index(default_points, dataset_path=None, cell_deg=0.02):
+    """データセットがあれば読み込み、なければ既定の地点データでインデックスを構築"""
+    points = default_points
+    if dataset_path and os.path.exists(dataset_path):
+        loaded = load_points_csv(dataset_path)
+        if loaded:
+            points = loaded
+    return SpatialIndex.from_points(points, cell_deg=cell_deg)
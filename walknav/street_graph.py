@@ -0,0 +1,275 @@
+"""歩行者道路ネットワークと周回ルート探索
+
+OSM抽出データ（.osm XML）から歩行可能な道路をCSR形式の配列に変換して保存し、
+読み込んだグラフ上でA*探索により指定距離の周回ルートを作る。
+
+    python -m walknav.street_graph kawasaki.osm data/street_graph.npz
+"""
+import heapq
+import math
+import random
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from .geo_distance import EARTH_RADIUS_KM, elementwise_distances, path_length_km
+from .spatial_index import SpatialIndex
+
+# 緯度1度あたりの距離（m）
+M_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM * 1000 / 180
+
+# 歩行者が通れる道路種別（OSMの highway タグ）
+WALKABLE_HIGHWAYS = {
+    'footway', 'pedestrian', 'path', 'steps', 'living_street', 'residential',
+    'service', 'unclassified', 'tertiary', 'tertiary_link', 'secondary',
+    'secondary_link', 'primary', 'primary_link', 'track', 'cycleway', 'corridor'
+}
+
+# 実際の道のりは直線距離よりこの程度長くなる（周回ルートの初期サイズ推定用）
+DETOUR_FACTOR = 1.25
+
+
+class StreetGraph:
+    """CSR形式の歩行者道路グラフ（無向グラフを双方向の有向辺で保持）
+
+    ノード i から出る辺は indices[indptr[i]:indptr[i+1]]、その長さ（m）は
+    lengths の同じ範囲に入っている。
+    """
+
+    def __init__(self, node_lats, node_lons, indptr, indices, lengths):
+        self.node_lats = np.asarray(node_lats, dtype=np.float64)
+        self.node_lons = np.asarray(node_lons, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+
+        self._node_index = SpatialIndex(self.node_lats, self.node_lons, cell_deg=0.005)
+
+        # 探索ループはPythonで回すので、要素アクセスの速いリストも持っておく
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._lengths = self.lengths.tolist()
+
+        # ヒューリスティック用の平面座標（m）
+        lat0 = float(self.node_lats.mean()) if len(self.node_lats) else 0.0
+        self._xs = (self.node_lons * M_PER_DEG_LAT * math.cos(math.radians(lat0))).tolist()
+        self._ys = (self.node_lats * M_PER_DEG_LAT).tolist()
+
+    @classmethod
+    def from_edges(cls, node_lats, node_lons, sources, targets, lengths=None):
+        """無向辺のリストからグラフを構築（長さ省略時は座標から計算）"""
+        node_lats = np.asarray(node_lats, dtype=np.float64)
+        node_lons = np.asarray(node_lons, dtype=np.float64)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if lengths is None:
+            lengths = elementwise_distances(
+                node_lats[sources], node_lons[sources], node_lats[targets], node_lons[targets]
+            ) * 1000
+
+        # 双方向の有向辺にして始点順に並べる
+        src = np.concatenate([sources, targets])
+        dst = np.concatenate([targets, sources])
+        lengths = np.concatenate([lengths, lengths])
+        order = np.argsort(src, kind='stable')
+        counts = np.bincount(src, minlength=len(node_lats))
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+
+        return cls(node_lats, node_lons, indptr, dst[order], lengths[order])
+
+    @classmethod
+    def load(cls, path):
+        """save() で保存したグラフを読み込む"""
+        with np.load(path) as data:
+            return cls(data['node_lats'], data['node_lons'], data['indptr'],
+                       data['indices'], data['lengths'])
+
+    def save(self, path):
+        """グラフを .npz 形式で保存"""
+        np.savez(path, node_lats=self.node_lats, node_lons=self.node_lons,
+                 indptr=self.indptr, indices=self.indices, lengths=self.lengths)
+
+    @property
+    def node_count(self):
+        return len(self.node_lats)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    def nearest_node(self, lat, lon, radius_km=None):
+        """座標に最も近いノード番号（見つからない場合はNone）"""
+        nearest = self._node_index.nearest(lat, lon, radius_km=radius_km)
+        return nearest['index'] if nearest else None
+
+    def shortest_path(self, source, target, weights=None):
+        """A*探索で最短経路を求める（ノード番号のリストと距離m、到達不能ならNone）
+
+        weights に辺の長さ以上のコスト（edge_costs.EdgeCostTable）を渡すと、
+        距離の代わりにそのコストの合計が最小になる経路を求める。
+        """
+        if source == target:
+            return [source], 0.0
+
+        indptr, indices = self._indptr, self._indices
+        lengths = self._lengths if weights is None else weights
+        xs, ys = self._xs, self._ys
+        tx, ty = xs[target], ys[target]
+        hypot = math.hypot
+
+        # 平面近似の誤差で過大評価しないよう少し割り引いた直線距離を推定値に使う
+        def heuristic(node):
+            return 0.99 * hypot(xs[node] - tx, ys[node] - ty)
+
+        dist = {source: 0.0}
+        parent = {source: -1}
+        heap = [(heuristic(source), 0.0, source)]
+        closed = set()
+
+        while heap:
+            _, d, node = heapq.heappop(heap)
+            if node in closed:
+                continue
+            if node == target:
+                break
+            closed.add(node)
+
+            for k in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[k]
+                nd = d + lengths[k]
+                if nd < dist.get(neighbor, math.inf):
+                    dist[neighbor] = nd
+                    parent[neighbor] = node
+                    heapq.heappush(heap, (nd + heuristic(neighbor), nd, neighbor))
+        else:
+            return None
+
+        path = [target]
+        while path[-1] != source:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path, dist[target]
+
+    def path_length_m(self, path):
+        """ノード番号のリストで表した経路の長さ（m）"""
+        return path_length_km(self.path_coords(path)) * 1000
+
+    def path_coords(self, path):
+        """ノード番号のリストを [[lat, lon], ...] に変換"""
+        return np.column_stack((self.node_lats[path], self.node_lons[path])).tolist()
+
+
+def _offset_point(lat, lon, distance_m, bearing):
+    """方位（ラジアン、北から時計回り）と距離から移動先の座標を求める"""
+    dlat = distance_m * math.cos(bearing) / M_PER_DEG_LAT
+    dlon = distance_m * math.sin(bearing) / (M_PER_DEG_LAT * math.cos(math.radians(lat)))
+    return lat + dlat, lon + dlon
+
+
+def plan_loop_route(graph, start_lat, start_lon, distance_km, bearing=None,
+                    tolerance=0.1, max_attempts=4, router=None, weights=None):
+    """出発地点に戻る指定距離の周回ルートを作る（作れない場合はNone）
+
+    出発ノードと、方位 bearing 方向に60度ずらして置いた2つの経由ノードを結ぶ
+    三角形の周回を最短経路でつなぎ、距離が目標に近づくよう経由地点の距離を
+    調整し直す。返り値は [[lat, lon], ...] の座標リスト。
+    router に縮約階層（contraction.ContractionHierarchy）を渡すと最短経路探索に使う。
+    weights に辺コストを渡すと、距離の代わりにコストが最小の経路でつなぐ
+    （router を渡す場合は同じコストで構築した縮約階層を使うこと）。
+    """
+    if router is not None:
+        find_path = router.shortest_path
+    else:
+        def find_path(a, b):
+            return graph.shortest_path(a, b, weights)
+    start = graph.nearest_node(start_lat, start_lon, radius_km=1.0)
+    if start is None or distance_km <= 0:
+        return None
+
+    target_m = distance_km * 1000
+    if bearing is None:
+        bearing = random.uniform(0, 2 * math.pi)
+    side = target_m / 3 / DETOUR_FACTOR
+    best = None
+
+    for _ in range(max_attempts):
+        waypoints = [start]
+        for angle in (bearing, bearing + math.pi / 3):
+            lat, lon = _offset_point(start_lat, start_lon, side, angle)
+            waypoints.append(graph.nearest_node(lat, lon))
+        waypoints.append(start)
+
+        path = [start]
+        for a, b in zip(waypoints[:-1], waypoints[1:]):
+            leg = find_path(a, b)
+            if leg is None:
+                path = None
+                break
+            path.extend(leg[0][1:])
+
+        # 探索結果はコストの合計なので、距離は経路の形から測り直す
+        length = graph.path_length_m(path) if path is not None else 0.0
+        if path is None or length == 0:
+            # 到達できない・経由地点が潰れた場合は向きを変えてやり直す
+            bearing += math.pi / 4
+            continue
+
+        error = abs(length - target_m) / target_m
+        if best is None or error < best[0]:
+            best = (error, path)
+        if error <= tolerance:
+            break
+        side *= target_m / length
+
+    if best is None:
+        return None
+
+    # 利用者の現在地から出発して現在地に戻る
+    return [[start_lat, start_lon]] + graph.path_coords(best[1]) + [[start_lat, start_lon]]
+
+
+def build_from_osm_xml(path):
+    """OSMのXML抽出データから歩行者道路グラフを構築"""
+    node_coords = {}
+    edges = []
+
+    for _, elem in ET.iterparse(path, events=('end',)):
+        if elem.tag == 'node':
+            node_coords[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+            elem.clear()
+        elif elem.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}
+            walkable = (tags.get('highway') in WALKABLE_HIGHWAYS
+                        and tags.get('foot') != 'no'
+                        and tags.get('access') not in ('private', 'no'))
+            if walkable:
+                refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                edges.extend(zip(refs[:-1], refs[1:]))
+            elem.clear()
+
+    # 道路で使われているノードだけに番号を振り直す
+    used = sorted({n for edge in edges for n in edge if n in node_coords})
+    numbering = {osm_id: i for i, osm_id in enumerate(used)}
+    edges = [(numbering[a], numbering[b]) for a, b in edges
+             if a in numbering and b in numbering and a != b]
+
+    lats = [node_coords[osm_id][0] for osm_id in used]
+    lons = [node_coords[osm_id][1] for osm_id in used]
+    sources = [a for a, _ in edges]
+    targets = [b for _, b in edges]
+    return StreetGraph.from_edges(lats, lons, sources, targets)
+
+
+def main():
+    if len(sys.argv) != 3:
+        print('使い方: python -m walknav.street_graph <入力.osm> <出力.npz>')
+        sys.exit(1)
+
+    graph = build_from_osm_xml(sys.argv[1])
+    graph.save(sys.argv[2])
+    print(f'ノード数: {graph.node_count}, 辺数: {graph.edge_count}')
+
+
+if __name__ == '__main__':
+    main()
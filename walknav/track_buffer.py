@@ -0,0 +1,128 @@
+import numpy as np
+
+
+class StringPool:
+    """文字列を番号に置き換えて1つだけ保持する（地域名などの重複をなくす）"""
+
+    def __init__(self):
+        self._strings = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def intern(self, value):
+        """文字列の番号を取得（初めての文字列は登録する）"""
+        value = '' if value is None else str(value)
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(value)
+            self._ids[value] = string_id
+        return string_id
+
+    def get(self, string_id):
+        """番号から文字列を取得"""
+        return self._strings[string_id]
+
+
+class TrackBuffer:
+    """散歩経路を列ごとの配列で保持するバッファ
+
+    座標・精度・時刻は float64、基準地点名や地域名は StringPool の番号（int32）で
+    保持する。容量が足りなくなったら倍に広げるので追加は償却O(1)。
+    lats / lons などの列は有効な範囲のビューを返し、コピーしない。
+    """
+
+    _FLOAT_COLUMNS = ('lat', 'lon', 'accuracy', 'timestamp')
+    _STRING_COLUMNS = ('base_location', 'gps_quality', 'city', 'district', 'area_type')
+
+    def __init__(self, capacity=64):
+        self._size = 0
+        self._strings = StringPool()
+        self._columns = {name: np.empty(capacity, dtype=np.float64) for name in self._FLOAT_COLUMNS}
+        self._columns.update({name: np.empty(capacity, dtype=np.int32) for name in self._STRING_COLUMNS})
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    @property
+    def capacity(self):
+        return len(self._columns['lat'])
+
+    @property
+    def nbytes(self):
+        """配列が確保しているメモリ量（バイト）"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def _grow(self):
+        """容量を倍に広げる"""
+        new_capacity = max(1, self.capacity * 2)
+        for name, column in self._columns.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def append(self, point, area=None):
+        """測位点（lat, lon, accuracy, timestamp など）と、その地点の地域情報を追加"""
+        if self._size == self.capacity:
+            self._grow()
+
+        i = self._size
+        for name in self._FLOAT_COLUMNS:
+            self._columns[name][i] = point.get(name) or 0.0
+        self._columns['base_location'][i] = self._strings.intern(point.get('base_location'))
+        self._columns['gps_quality'][i] = self._strings.intern(point.get('gps_quality'))
+
+        area = area or {}
+        for name in ('city', 'district', 'area_type'):
+            self._columns[name][i] = self._strings.intern(area.get(name))
+
+        self._size += 1
+
+    def take(self, indices):
+        """指定した番号の点だけを持つ新しいバッファ（文字列の表は共有する）"""
+        indices = np.asarray(indices, dtype=np.intp)
+        taken = TrackBuffer(capacity=max(1, len(indices)))
+        taken._strings = self._strings
+        for name, column in self._columns.items():
+            taken._columns[name][:len(indices)] = column[:self._size][indices]
+        taken._size = len(indices)
+        return taken
+
+    def column(self, name):
+        """列の有効な範囲のビュー"""
+        return self._columns[name][:self._size]
+
+    @property
+    def lats(self):
+        return self.column('lat')
+
+    @property
+    def lons(self):
+        return self.column('lon')
+
+    @property
+    def timestamps(self):
+        return self.column('timestamp')
+
+    def coords(self, start=0, stop=None):
+        """[[lat, lon], ...] 形式の座標リスト（地図描画用）"""
+        return np.column_stack((self.lats[start:stop], self.lons[start:stop])).tolist()
+
+    def point(self, index):
+        """測位点を辞書で取得"""
+        index = range(self._size)[index]
+        point = {name: float(self._columns[name][index]) for name in self._FLOAT_COLUMNS}
+        point['base_location'] = self._strings.get(self._columns['base_location'][index])
+        point['gps_quality'] = self._strings.get(self._columns['gps_quality'][index])
+        return point
+
+    def area(self, index):
+        """測位点の地域情報（city, district, area_type）を辞書で取得"""
+        index = range(self._size)[index]
+        return {name: self._strings.get(self._columns[name][index])
+                for name in ('city', 'district', 'area_type')}
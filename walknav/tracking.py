@@ -0,0 +1,143 @@
+"""散歩中の位置の追跡と記録
+
+散歩の状態（開始時刻・歩いた経路・距離など）は呼び出し側が渡す辞書形式の
+state に持たせる。Streamlit では st.session_state をそのまま渡し、UIなしで
+動かすときは普通の辞書を渡せばよい。
+"""
+import time
+from datetime import datetime
+
+from .gps_pipeline import GpsSmoother
+from .location import get_detailed_location_info
+from .location_sources import create_location_source
+from .polyline import encode, simplify_indices
+from .profiling import profiled
+from .track_buffer import TrackBuffer
+
+
+# 散歩記録に残す経路（Encoded Polyline 形式）の許容誤差と頂点数の上限
+RECORD_PATH_TOLERANCE_M = 5.0
+RECORD_PATH_MAX_VERTICES = 500
+
+
+def get_gps_fix_batch(state, now=None):
+    """前回の取得以降の測位を散歩の測位の取得元からまとめて取得"""
+    source = state.get('location_source')
+    if source is None:
+        source = state['location_source'] = create_location_source(state.get('selected_route'))
+    return source.read(time.time() if now is None else now)
+
+
+def start_walking_session(state, selected_route, location_source=None, now=None):
+    """散歩セッションを開始（state に散歩中の状態を用意する）
+
+    location_source を省略すると設定に応じた取得元（既定はシミュレーション）を使う。
+    now（UNIX時刻の秒）を渡すと、現在時刻の代わりにその時刻で記録する。
+    """
+    state['walking_start_time'] = datetime.now() if now is None else datetime.fromtimestamp(now)
+    state['walking_progress'] = 0
+    state['selected_route'] = selected_route
+    state['walking_path'] = TrackBuffer()
+    state['total_distance'] = 0
+    state['gps_smoother'] = GpsSmoother()
+    state['location_source'] = location_source or create_location_source(selected_route)
+
+    # 散歩開始ログ
+    state['walking_log'] = {
+        'start_time': state['walking_start_time'],
+        'route_name': selected_route['name'],
+        'planned_distance': selected_route['distance'],
+        'planned_time': selected_route['time'],
+        'checkpoints': []
+    }
+
+
+@profiled()
+def update_walking_progress(state, now=None):
+    """散歩進捗を更新（now はUNIX時刻の秒。省略すると現在時刻）"""
+    if state['walking_start_time']:
+        # 前回の更新以降に届いた測位をまとめて平滑化し、移動した点だけを記録
+        fixes = get_gps_fix_batch(state, now)
+
+        for point in state['gps_smoother'].feed(fixes):
+            state['total_distance'] += point['distance_m'] / 1000  # km単位
+
+            # 地点の地域情報と合わせて記録
+            detailed_location = get_detailed_location_info(point['lat'], point['lon'])
+            state['walking_path'].append(point, detailed_location)
+
+        # 進捗率を計算
+        planned_distance = float(state['selected_route']['distance'].replace('km', ''))
+        if planned_distance > 0:
+            state['walking_progress'] = min(100,
+                (state['total_distance'] / planned_distance) * 100)
+
+
+def get_walking_stats(state, now=None):
+    """散歩統計を取得（now はUNIX時刻の秒。省略すると現在時刻）"""
+    if not state['walking_start_time']:
+        return None
+
+    elapsed_time = (datetime.now() if now is None else datetime.fromtimestamp(now)) - state['walking_start_time']
+    elapsed_minutes = elapsed_time.total_seconds() / 60
+
+    # 平均速度を計算
+    if elapsed_minutes > 0 and state['total_distance'] > 0:
+        avg_speed = (state['total_distance'] / elapsed_minutes) * 60  # km/h
+    else:
+        avg_speed = 0
+
+    # 消費カロリーを推定（簡易計算）
+    calories = state['total_distance'] * 50  # 1kmあたり50kcal
+
+    return {
+        'elapsed_time': elapsed_minutes,
+        'elapsed_time_str': f"{int(elapsed_minutes)}分{int((elapsed_minutes % 1) * 60)}秒",
+        'distance': state['total_distance'],
+        'progress': state['walking_progress'],
+        'avg_speed': avg_speed,
+        'calories': calories,
+        'checkpoints': len(state['walking_path'])
+    }
+
+
+def finish_walking_session(state, now=None):
+    """散歩セッションを終了し、散歩記録を返す（散歩中でなければNone）"""
+    if state['walking_start_time']:
+        end_time = datetime.now() if now is None else datetime.fromtimestamp(now)
+        stats = get_walking_stats(state, now)
+        path = state['walking_path']
+        kept = simplify_indices(path.lats, path.lons, RECORD_PATH_TOLERANCE_M, RECORD_PATH_MAX_VERTICES)
+
+        # 散歩記録を保存
+        walking_record = {
+            'date': state['walking_start_time'].strftime('%Y-%m-%d'),
+            'start_time': state['walking_start_time'].strftime('%H:%M'),
+            'end_time': end_time.strftime('%H:%M'),
+            'route_name': state['selected_route']['name'],
+            'planned_distance': state['selected_route']['distance'],
+            'actual_distance': f"{stats['distance']:.2f}km",
+            'duration': stats['elapsed_time_str'],
+            'avg_speed': f"{stats['avg_speed']:.1f}km/h",
+            'calories': f"{stats['calories']:.0f}kcal",
+            'checkpoints': stats['checkpoints'],
+            'locations_visited': len(path),
+            # 歩いた経路（簡略化して符号化したもの。送信・保存用）
+            'path_polyline': encode(list(zip(path.lats[kept], path.lons[kept]))),
+            # 集計・保存用の数値
+            'planned_distance_km': float(state['selected_route']['distance'].replace('km', '')),
+            'actual_distance_km': stats['distance'],
+            'duration_s': stats['elapsed_time'] * 60,
+            'avg_speed_kmh': stats['avg_speed'],
+            'calories_kcal': stats['calories']
+        }
+
+        # セッション状態をクリア
+        state['walking_start_time'] = None
+        state['walking_progress'] = 0
+        state['walking_path'] = TrackBuffer()
+        state['total_distance'] = 0
+
+        return walking_record
+
+    return None